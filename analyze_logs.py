@@ -7,328 +7,416 @@ import argparse
 import re
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict, Counter
-
-class LogAnalyzer:
-    """Analyze ReDroid Enhanced build logs for debugging"""
-
-    def __init__(self, log_dir="logs"):
-        self.log_dir = Path(log_dir)
-        if not self.log_dir.exists():
-            print(f"❌ Log directory {log_dir} not found")
-            sys.exit(1)
-
-    def find_latest_logs(self):
-        """Find the latest log files"""
-        latest_files = {}
-
-        # Look for latest symlinks first
-        symlinks = {
-            'detailed': 'latest_detailed.log',
-            'errors': 'latest_errors.log',
-            'structured': 'latest_structured.json'
-        }
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from tools import log_db
+from tools.log_index import SESSION_FILES, load_index, open_log
+
+# Entries shown per list in a report, so memory stays bounded however long the logs are
+SHOWN = 50
+
+# Error log line markers and the category they are counted under
+ERROR_KINDS = [
+    (('ImportError',), 'Import Errors'),
+    (('FileNotFoundError',), 'File Not Found'),
+    (('PermissionError',), 'Permission Errors'),
+    (('CalledProcessError',), 'Command Failures'),
+    (('ConnectionError', 'URLError'), 'Network Errors'),
+]
+
+def read_entries(f):
+    """Decoded entries of a structured log, skipping lines that are not JSON"""
+    for line in f:
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+def scan(log_files, consumers):
+    """Feed every consumer from one sequential read of each log file it needs
+
+    Text logs are fed as (line number, line) pairs, the structured log as
+    decoded entries; each line is read and decoded once whatever the number
+    of consumers.
+    """
+    for source in ('detailed', 'errors', 'structured'):
+        interested = [c for c in consumers if source in c.sources]
+        path = log_files.get(source)
+        if not interested or not path or not path.exists():
+            continue
+        for consumer in interested:
+            consumer.found.add(source)
+        try:
+            with open_log(path) as f:
+                items = read_entries(f) if source == 'structured' else enumerate(f, 1)
+                for item in items:
+                    for consumer in interested:
+                        consumer.feed(source, item)
+        except Exception as e:
+            print(f"❌ Error reading {source} log: {e}")
+
+class Consumer:
+    """One analysis fed a stream of log items by scan()
+
+    feed() sees each item once, merge() adds the partial result of another
+    consumer of the same kind, render() prints the report.
+    """
+    sources = ()
+
+    def __init__(self):
+        self.found = set()
+
+    def feed(self, source, item):
+        raise NotImplementedError
+
+    def merge(self, other):
+        self.found |= other.found
+
+    def render(self):
+        raise NotImplementedError
+
+class BuildSummary(Consumer):
+    """Build status from the detailed log and run details from the structured one"""
+    sources = ('detailed', 'structured')
+    FIELDS = [('android_version', '🤖 Android Version'), ('device_profile', '📱 Device Profile'), ('container_type', '🐳 Container')]
+
+    def __init__(self):
+        super().__init__()
+        self.succeeded = False
+        self.failed = False
+        self.details = {}
+
+    def feed(self, source, item):
+        if source == 'detailed':
+            line = item[1]
+            if "BUILD COMPLETED SUCCESSFULLY" in line:
+                self.succeeded = True
+            elif "BUILD FAILED" in line:
+                self.failed = True
+        elif len(self.details) < len(self.FIELDS):
+            for key, _ in self.FIELDS:
+                if key in item and key not in self.details:
+                    self.details[key] = item[key]
+
+    def merge(self, other):
+        super().merge(other)
+        self.succeeded = self.succeeded or other.succeeded
+        self.failed = self.failed or other.failed
+        for key, value in other.details.items():
+            self.details.setdefault(key, value)
+
+    def render(self):
+        print("📋 Build Summary")
+        print("=" * 50)
 
-        for log_type, symlink in symlinks.items():
-            symlink_path = self.log_dir / symlink
-            if symlink_path.exists():
-                latest_files[log_type] = symlink_path
+        if 'detailed' in self.found:
+            if self.succeeded:
+                print("✅ Build Status: SUCCESS")
+            elif self.failed:
+                print("❌ Build Status: FAILED")
             else:
-                # Fallback: find most recent file
-                pattern = f"{log_type}_*.{'json' if log_type == 'structured' else 'log'}"
-                files = list(self.log_dir.glob(pattern))
-                if files:
-                    latest_files[log_type] = max(files, key=os.path.getctime)
-
-        return latest_files
-
-    def find_session_logs(self, session_id):
-        """Find logs for a specific session ID"""
-        session_files = {}
-        patterns = {
-            'detailed': f'detailed_{session_id}.log',
-            'errors': f'errors_{session_id}.log',
-            'structured': f'structured_{session_id}.json'
-        }
-
-        for log_type, pattern in patterns.items():
-            file_path = self.log_dir / pattern
-            if file_path.exists():
-                session_files[log_type] = file_path
+                print("⚠️  Build Status: INCOMPLETE")
 
-        return session_files
-
-    def list_sessions(self):
-        """List all available sessions"""
-        sessions = set()
-        pattern = re.compile(r'(detailed|errors|structured)_(\d{8}_\d{6})\.(log|json)')
+        for key, label in self.FIELDS:
+            if key in self.details:
+                print(f"{label}: {self.details[key]}")
 
-        for file_path in self.log_dir.iterdir():
-            match = pattern.match(file_path.name)
-            if match:
-                sessions.add(match.group(2))
-
-        return sorted(list(sessions), reverse=True)
+        print()
 
-    def analyze_errors(self, log_files):
-        """Analyze error patterns"""
+class ErrorPatterns(Consumer):
+    """Error log lines counted by kind, keeping the last few of each"""
+    sources = ('errors',)
+    RECENT = 3
+
+    def __init__(self):
+        super().__init__()
+        self.counts = Counter()
+        self.recent = {}
+        self.module_errors = Counter()
+
+    def feed(self, source, item):
+        line_num, line = item
+        line = line.strip()
+        if ' ERROR ' not in line:
+            return
+        kind = next((name for markers, name in ERROR_KINDS if any(m in line for m in markers)), 'Other Errors')
+        self.counts[kind] += 1
+        self.recent.setdefault(kind, deque(maxlen=self.RECENT)).append((line_num, line))
+
+        module_match = re.search(r'module=(\S+)', line)
+        if module_match:
+            self.module_errors[module_match.group(1)] += 1
+
+    def merge(self, other):
+        super().merge(other)
+        self.counts.update(other.counts)
+        for kind, lines in other.recent.items():
+            self.recent.setdefault(kind, deque(maxlen=self.RECENT)).extend(lines)
+        self.module_errors.update(other.module_errors)
+
+    def render(self):
         print("🔍 Error Analysis")
         print("=" * 50)
 
-        error_file = log_files.get('errors')
-        if not error_file or not error_file.exists():
+        if 'errors' not in self.found:
             print("❌ No error log file found")
             return
 
-        error_patterns = defaultdict(list)
-        module_errors = defaultdict(list)
-
-        with open(error_file, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if ' ERROR ' in line:
-                    # Extract error type
-                    if 'ImportError' in line:
-                        error_patterns['Import Errors'].append((line_num, line))
-                    elif 'FileNotFoundError' in line:
-                        error_patterns['File Not Found'].append((line_num, line))
-                    elif 'PermissionError' in line:
-                        error_patterns['Permission Errors'].append((line_num, line))
-                    elif 'CalledProcessError' in line:
-                        error_patterns['Command Failures'].append((line_num, line))
-                    elif 'ConnectionError' in line or 'URLError' in line:
-                        error_patterns['Network Errors'].append((line_num, line))
-                    else:
-                        error_patterns['Other Errors'].append((line_num, line))
-
-                    # Extract module name if present
-                    module_match = re.search(r'module=([^\\s]+)', line)
-                    if module_match:
-                        module_errors[module_match.group(1)].append((line_num, line))
-
-        # Display error summary
-        if not error_patterns:
+        if not self.counts:
             print("✅ No errors found!")
             return
 
-        print(f"📊 Found {sum(len(errors) for errors in error_patterns.values())} errors")
+        print(f"📊 Found {sum(self.counts.values())} errors")
         print()
 
-        for error_type, errors in error_patterns.items():
-            if errors:
-                print(f"🚨 {error_type} ({len(errors)} occurrences):")
-                for line_num, error in errors[-3:]:  # Show last 3 of each type
-                    # Extract just the error message
-                    error_msg = error.split(' - ')[-1] if ' - ' in error else error
-                    print(f"   Line {line_num}: {error_msg}")
-                print()
-
-        # Module-specific errors
-        if module_errors:
+        for error_type, count in self.counts.items():
+            print(f"🚨 {error_type} ({count} occurrences):")
+            for line_num, error in self.recent[error_type]:
+                # Extract just the error message
+                error_msg = error.split(' - ')[-1] if ' - ' in error else error
+                print(f"   Line {line_num}: {error_msg}")
+            print()
+
+        if self.module_errors:
             print("📦 Module-specific errors:")
-            for module, errors in module_errors.items():
-                print(f"   {module}: {len(errors)} error(s)")
+            for module, count in self.module_errors.items():
+                print(f"   {module}: {count} error(s)")
             print()
 
-    def analyze_downloads(self, log_files):
-        """Analyze download issues"""
+class DownloadStats(Consumer):
+    """Started, completed and failed downloads"""
+    sources = ('structured',)
+
+    def __init__(self):
+        super().__init__()
+        self.counts = Counter()
+        self.started = set()
+        self.completed = set()
+        self.failed = deque(maxlen=SHOWN)
+
+    def feed(self, source, entry):
+        action = entry.get('action', '')
+        if action == 'download_start':
+            self.counts['started'] += 1
+            self.started.add(entry.get('filename'))
+        elif action == 'download_complete':
+            self.counts['completed'] += 1
+            self.completed.add(entry.get('filename'))
+        elif 'download' in action and entry.get('level') == 'ERROR':
+            self.counts['failed'] += 1
+            self.failed.append((entry.get('filename', 'Unknown'), entry.get('message', 'Unknown error')))
+
+    def merge(self, other):
+        super().merge(other)
+        self.counts.update(other.counts)
+        self.started |= other.started
+        self.completed |= other.completed
+        self.failed.extend(other.failed)
+
+    def render(self):
         print("📥 Download Analysis")
         print("=" * 50)
 
-        structured_file = log_files.get('structured')
-        if not structured_file or not structured_file.exists():
+        if 'structured' not in self.found:
             print("❌ No structured log file found")
             return
 
-        downloads = {
-            'started': [],
-            'completed': [],
-            'failed': []
-        }
-
-        try:
-            with open(structured_file, 'r') as f:
-                for line in f:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        action = log_entry.get('action', '')
-
-                        if action == 'download_start':
-                            downloads['started'].append(log_entry)
-                        elif action == 'download_complete':
-                            downloads['completed'].append(log_entry)
-                        elif 'download' in action and log_entry.get('level') == 'ERROR':
-                            downloads['failed'].append(log_entry)
-
-                    except json.JSONDecodeError:
-                        continue
-
-        except Exception as e:
-            print(f"❌ Error reading structured log: {e}")
-            return
-
-        print(f"📊 Downloads started: {len(downloads['started'])}")
-        print(f"✅ Downloads completed: {len(downloads['completed'])}")
-        print(f"❌ Downloads failed: {len(downloads['failed'])}")
+        print(f"📊 Downloads started: {self.counts['started']}")
+        print(f"✅ Downloads completed: {self.counts['completed']}")
+        print(f"❌ Downloads failed: {self.counts['failed']}")
         print()
 
-        # Show failed downloads
-        if downloads['failed']:
+        if self.failed:
             print("🚨 Failed downloads:")
-            for download in downloads['failed']:
-                print(f"   {download.get('filename', 'Unknown')}: {download.get('message', 'Unknown error')}")
+            for filename, message in self.failed:
+                print(f"   {filename}: {message}")
             print()
 
-        # Show incomplete downloads
-        started_files = {d.get('filename') for d in downloads['started']}
-        completed_files = {d.get('filename') for d in downloads['completed']}
-        incomplete = started_files - completed_files
-
+        incomplete = self.started - self.completed
         if incomplete:
             print("⚠️  Incomplete downloads:")
-            for filename in incomplete:
+            for filename in sorted(incomplete, key=str):
                 print(f"   {filename}")
             print()
 
-    def analyze_docker_build(self, log_files):
-        """Analyze Docker build issues"""
-        print("🐳 Docker Build Analysis")
+class ModuleStats(Consumer):
+    """Outcome of each module installation"""
+    sources = ('structured',)
+
+    def __init__(self):
+        super().__init__()
+        self.actions = {}
+        self.errors = {}
+
+    def feed(self, source, entry):
+        module = entry.get('module_name')
+        action = entry.get('action')
+        if not module or not action:
+            return
+        self.actions.setdefault(module, set()).add(action)
+        if action == 'error':
+            self.errors.setdefault(module, deque(maxlen=SHOWN)).append(entry.get('error', 'Unknown error'))
+
+    def merge(self, other):
+        super().merge(other)
+        for module, actions in other.actions.items():
+            self.actions.setdefault(module, set()).update(actions)
+        for module, errors in other.errors.items():
+            self.errors.setdefault(module, deque(maxlen=SHOWN)).extend(errors)
+
+    def render(self):
+        print("📦 Module Installation Analysis")
         print("=" * 50)
 
-        structured_file = log_files.get('structured')
-        if not structured_file or not structured_file.exists():
+        if 'structured' not in self.found:
             print("❌ No structured log file found")
             return
 
-        docker_events = []
+        if not self.actions:
+            print("ℹ️  No module installation events found")
+            return
 
-        try:
-            with open(structured_file, 'r') as f:
-                for line in f:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        action = log_entry.get('action', '')
+        print("📊 Module Installation Summary:")
+        for module, actions in self.actions.items():
+            if 'success' in actions:
+                status = "✅ SUCCESS"
+            elif 'error' in actions:
+                status = "❌ FAILED"
+            elif 'start' in actions:
+                status = "⚠️  INCOMPLETE"
+            else:
+                status = "❓ UNKNOWN"
 
-                        if 'docker' in action or 'command' in action:
-                            docker_events.append(log_entry)
+            print(f"   {module}: {status}")
 
-                    except json.JSONDecodeError:
-                        continue
+            # Show errors for failed modules
+            for error_msg in self.errors.get(module, ()):
+                print(f"      Error: {error_msg}")
 
-        except Exception as e:
-            print(f"❌ Error reading structured log: {e}")
+class DockerEvents(Consumer):
+    """Image builds and failed commands"""
+    sources = ('structured',)
+
+    def __init__(self):
+        super().__init__()
+        self.seen = 0
+        self.events = deque(maxlen=SHOWN)
+
+    def feed(self, source, entry):
+        action = entry.get('action', '')
+        if 'docker' not in action and 'command' not in action:
             return
+        self.seen += 1
+        if action in ('docker_build_start', 'docker_build_complete', 'command_error'):
+            self.events.append({key: entry.get(key) for key in ('action', 'image_name', 'build_time', 'command', 'stderr')})
 
-        if not docker_events:
-            print("ℹ️  No Docker build events found")
+    def merge(self, other):
+        super().merge(other)
+        self.seen += other.seen
+        self.events.extend(other.events)
+
+    def render(self):
+        print("🐳 Docker Build Analysis")
+        print("=" * 50)
+
+        if 'structured' not in self.found:
+            print("❌ No structured log file found")
             return
 
-        for event in docker_events:
-            action = event.get('action', '')
-            timestamp = event.get('timestamp', '')
-            level = event.get('level', '')
+        if not self.seen:
+            print("ℹ️  No Docker build events found")
+            return
 
+        for event in self.events:
+            action = event['action']
             if action == 'docker_build_start':
-                print(f"🏁 Build started: {event.get('image_name', 'Unknown')}")
+                print(f"🏁 Build started: {event['image_name'] or 'Unknown'}")
             elif action == 'docker_build_complete':
-                build_time = event.get('build_time', 0)
-                print(f"✅ Build completed in {build_time:.2f}s: {event.get('image_name', 'Unknown')}")
+                print(f"✅ Build completed in {event['build_time'] or 0:.2f}s: {event['image_name'] or 'Unknown'}")
             elif action == 'command_error':
-                print(f"❌ Command failed: {event.get('command', 'Unknown')}")
-                if event.get('stderr'):
-                    print(f"   Error: {event.get('stderr')}")
+                print(f"❌ Command failed: {event['command'] or 'Unknown'}")
+                if event['stderr']:
+                    print(f"   Error: {event['stderr']}")
 
-    def analyze_modules(self, log_files):
-        """Analyze module installation"""
-        print("📦 Module Installation Analysis")
-        print("=" * 50)
+# Reports of a full analysis, in the order they are printed
+ANALYSES = [BuildSummary, ErrorPatterns, DownloadStats, ModuleStats, DockerEvents]
 
-        structured_file = log_files.get('structured')
-        if not structured_file or not structured_file.exists():
-            print("❌ No structured log file found")
-            return
+def analyze_session(analyses, log_files):
+    """Partial results of one session's log files, run in a worker process"""
+    consumers = [analysis() for analysis in analyses]
+    scan(log_files, consumers)
+    return consumers
 
-        modules = defaultdict(list)
+class LogAnalyzer:
+    """Analyze ReDroid Enhanced build logs for debugging"""
 
-        try:
-            with open(structured_file, 'r') as f:
-                for line in f:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        module = log_entry.get('module')
-                        action = log_entry.get('action')
+    def __init__(self, log_dir="logs"):
+        self.log_dir = Path(log_dir)
+        if not self.log_dir.exists():
+            print(f"❌ Log directory {log_dir} not found")
+            sys.exit(1)
 
-                        if module and action:
-                            modules[module].append((action, log_entry))
+    def find_latest_logs(self):
+        """Find the latest log files"""
+        latest_files = {}
 
-                    except json.JSONDecodeError:
-                        continue
+        # Look for latest symlinks first
+        symlinks = {
+            'detailed': 'latest_detailed.log',
+            'errors': 'latest_errors.log',
+            'structured': 'latest_structured.json'
+        }
 
-        except Exception as e:
-            print(f"❌ Error reading structured log: {e}")
-            return
+        for log_type, symlink in symlinks.items():
+            symlink_path = self.log_dir / symlink
+            if symlink_path.exists():
+                latest_files[log_type] = symlink_path
+        if not latest_files:
+            # Fallback: the most recent session of the index
+            sessions = self.list_sessions()
+            if sessions:
+                latest_files = self.find_session_logs(sessions[0])
 
-        if not modules:
-            print("ℹ️  No module installation events found")
-            return
+        return latest_files
 
-        print("📊 Module Installation Summary:")
-        for module, events in modules.items():
-            actions = [event[0] for event in events]
-            if 'success' in actions:
-                status = "✅ SUCCESS"
-            elif 'error' in actions:
-                status = "❌ FAILED"
-            elif 'start' in actions:
-                status = "⚠️  INCOMPLETE"
-            else:
-                status = "❓ UNKNOWN"
+    def find_session_logs(self, session_id, index=None):
+        """Find logs for a specific session ID, in index when given rather than a fresh read of the index"""
+        session_files = {}
+        entry = (load_index(self.log_dir) if index is None else index).get(session_id)
+        if entry:
+            names = entry['files']
+        else:
+            names = {log_type: SESSION_FILES[log_type].format(session_id) for log_type in ('detailed', 'errors', 'structured')}
+
+        for log_type, name in names.items():
+            if log_type == 'issue_report':
+                continue
+            # Closed sessions may have been compressed since the index was read
+            for candidate in (name, name + '.gz', name + '.zst', name.rsplit('.', 1)[0]):
+                file_path = self.log_dir / candidate
+                if file_path.exists():
+                    session_files[log_type] = file_path
+                    break
 
-            print(f"   {module}: {status}")
+        return session_files
 
-            # Show errors for failed modules
-            if 'error' in actions:
-                error_events = [event[1] for event in events if event[0] == 'error']
-                for error_event in error_events:
-                    error_msg = error_event.get('error', 'Unknown error')
-                    print(f"      Error: {error_msg}")
-
-    def generate_summary(self, log_files):
-        """Generate a summary report"""
-        print("📋 Build Summary")
-        print("=" * 50)
+    def list_sessions(self):
+        """List all available sessions, from the session index when there is one"""
+        return sorted(load_index(self.log_dir), reverse=True)
 
-        # Check if build completed successfully
-        detailed_file = log_files.get('detailed')
-        if detailed_file and detailed_file.exists():
-            with open(detailed_file, 'r') as f:
-                content = f.read()
-                if "BUILD COMPLETED SUCCESSFULLY" in content:
-                    print("✅ Build Status: SUCCESS")
-                elif "BUILD FAILED" in content:
-                    print("❌ Build Status: FAILED")
-                else:
-                    print("⚠️  Build Status: INCOMPLETE")
-
-        # Extract basic info from structured log
-        structured_file = log_files.get('structured')
-        if structured_file and structured_file.exists():
-            try:
-                with open(structured_file, 'r') as f:
-                    first_line = f.readline()
-                    if first_line:
-                        first_entry = json.loads(first_line.strip())
-                        if 'android_version' in first_entry:
-                            print(f"🤖 Android Version: {first_entry.get('android_version')}")
-                        if 'device_profile' in first_entry:
-                            print(f"📱 Device Profile: {first_entry.get('device_profile')}")
-                        if 'container_type' in first_entry:
-                            print(f"🐳 Container: {first_entry.get('container_type')}")
-
-            except:
-                pass
+    def analyze(self, log_files, analyses=ANALYSES):
+        """Run analyses over one pass of the logs and print their reports"""
+        consumers = [analysis() for analysis in analyses]
+        scan(log_files, consumers)
+        for consumer in consumers:
+            consumer.render()
+        return consumers
 
-        print()
+    def analyze_errors(self, log_files):
+        """Analyze error patterns"""
+        self.analyze(log_files, [ErrorPatterns])
 
     def create_debug_package(self, session_id=None):
         """Create a debug package for sharing"""
@@ -357,7 +445,7 @@ class LogAnalyzer:
             for log_type, log_file in log_files.items():
                 f.write(f"\n{'='*20} {log_type.upper()} LOG {'='*20}\n")
                 try:
-                    with open(log_file, 'r') as log_f:
+                    with open_log(log_file) as log_f:
                         f.write(log_f.read())
                 except Exception as e:
                     f.write(f"Error reading {log_file}: {e}\n")
@@ -382,12 +470,39 @@ class LogAnalyzer:
         print(f"📁 Log directory: {self.log_dir.absolute()}")
         print()
 
-        self.generate_summary(log_files)
-        self.analyze_errors(log_files)
-        self.analyze_downloads(log_files)
-        self.analyze_modules(log_files)
-        self.analyze_docker_build(log_files)
+        self.analyze(log_files)
+        self.print_recommendations()
+
+    def sessions_since(self, since=None):
+        """Sessions started at or after since (see log_db.parse_since), oldest first"""
+        sessions = sorted(self.list_sessions())
+        if since:
+            cutoff = datetime.fromisoformat(log_db.parse_since(since)).strftime("%Y%m%d_%H%M%S")
+            sessions = [session for session in sessions if session >= cutoff]
+        return sessions
 
+    def analyze_sessions(self, session_ids, analyses=ANALYSES, workers=None):
+        """Run analyses over many sessions on a process pool and print one merged report"""
+        print(f"🔍 Analyzing {len(session_ids)} sessions")
+        print(f"📁 Log directory: {self.log_dir.absolute()}")
+        print()
+        totals = [analysis() for analysis in analyses]
+        if session_ids:
+            # Resolve every session's files from one read of the index, workers only read logs
+            index = load_index(self.log_dir)
+            log_files = [self.find_session_logs(session_id, index) for session_id in session_ids]
+            workers = workers or os.cpu_count()
+            # Hand out sessions in batches so tens of thousands of tiny ones do not drown in IPC
+            chunksize = max(len(session_ids) // (workers * 4), 1)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for partials in pool.map(partial(analyze_session, analyses), log_files, chunksize=chunksize):
+                    for total, part in zip(totals, partials):
+                        total.merge(part)
+        for total in totals:
+            total.render()
+        return totals
+
+    def print_recommendations(self):
         print("💡 Recommendations:")
         print("=" * 50)
         print("1. If downloads failed, check internet connection and retry")
@@ -404,11 +519,31 @@ def main():
     parser.add_argument('--list-sessions', action='store_true', help='List all available sessions')
     parser.add_argument('--create-debug-package', action='store_true', help='Create debug package for sharing')
     parser.add_argument('--errors-only', action='store_true', help='Show only error analysis')
+    parser.add_argument('--db', help='SQLite session database (default: <log-dir>/sessions.db)')
+    parser.add_argument('--ingest', action='store_true', help='Load new sessions into the session database')
+    parser.add_argument('--query', choices=sorted(log_db.QUERIES), help='Run a query over the session database')
+    parser.add_argument('--sql', help='Run an SQL statement over the session database')
+    parser.add_argument('--module', help='Only query events of this module, e.g. litegapps')
+    parser.add_argument('--since', help='Only query or analyze sessions since 30d, 12h, 90m or an ISO date')
+    parser.add_argument('--all-sessions', action='store_true', help='Analyze every session (or those --since) into one report')
+    parser.add_argument('-j', '--jobs', type=int, help='Worker processes for --all-sessions (default: all cores)')
 
     args = parser.parse_args()
 
     analyzer = LogAnalyzer(args.log_dir)
 
+    if args.ingest or args.query or args.sql:
+        db = log_db.connect(args.db or str(analyzer.log_dir / log_db.DB_FILE))
+        if args.ingest:
+            loaded = log_db.ingest(db, analyzer.log_dir)
+            print(f"📥 Ingested {sum(loaded.values())} events from {len(loaded)} session(s)")
+        if args.query:
+            log_db.print_table(*log_db.QUERIES[args.query](db, args.module, args.since))
+        if args.sql:
+            log_db.print_table(*log_db.sql(db, args.sql))
+        db.close()
+        return
+
     if args.list_sessions:
         sessions = analyzer.list_sessions()
         if sessions:
@@ -419,6 +554,13 @@ def main():
             print("❌ No sessions found")
         return
 
+    if args.all_sessions or args.since:
+        analyses = [ErrorPatterns] if args.errors_only else ANALYSES
+        analyzer.analyze_sessions(analyzer.sessions_since(args.since), analyses, args.jobs)
+        if not args.errors_only:
+            analyzer.print_recommendations()
+        return
+
     if args.create_debug_package:
         analyzer.create_debug_package(args.session)
         return
@@ -1,21 +1,226 @@
 #!/usr/bin/env python3
 
 import argparse
-from stuff.gapps import Gapps
-from stuff.litegapps import LiteGapps
-from stuff.magisk import Magisk
-from stuff.mindthegapps import MindTheGapps
-from stuff.ndk import Ndk
-from stuff.houdini import Houdini
-from stuff.houdini_hack import Houdini_Hack
-from stuff.widevine import Widevine
+import atexit
+import contextlib
+import os
+import sys
+from stuff.compat import addon_components, load_matrix
+from stuff.magisk_module import install_modules
+from stuff.package_selection import tree_size
+from stuff.registry import component
+import tools.engine as engine
 import tools.helper as helper
-import subprocess
+from tools.layers import normalize_tree, source_date_epoch, store_layers, use_cached_layers
+import tools.matrix as matrix
+import tools.metrics as metrics
+import tools.plan as plan
+import tools.trace as trace
+from tools.size_report import size_report, write_report
+from tools.workspace import Workspace
+
+# Addons in the order they are layered into the image
+ADDONS = ["gapps", "litegapps", "mindthegapps", "ndk", "houdini", "magisk", "magisk_enhanced",
+          "rezygisk", "playintegrity", "trickystore", "tricky_addon", "ksu_webui", "widevine"]
+
+# Standalone Magisk modules, staged together as the "modules" addon
+MODULES = ["rezygisk", "playintegrity", "trickystore", "tricky_addon", "ksu_webui"]
+
+# Components whose artifact depends on the Android version
+VERSIONED = {"litegapps", "mindthegapps", "houdini", "houdini_hack", "widevine"}
+
+
+def select_components(android, addons, options=None):
+    """Resolve addon names into (copy dir name, [components]) pairs in Dockerfile order
+
+    options maps a component name to extra constructor keyword arguments.
+    Addons the compatibility matrix rejects for this host are dropped; check_builds
+    reports them.
+    """
+    options = options or {}
+    arch = helper.probe_host().arch
+    compat = load_matrix(tuple(ADDONS))
+    selected = []
+    for addon in ADDONS:
+        if addon not in addons or compat.reason(addon, android, arch):
+            continue
+        components = []
+        for name in addon_components(addon, android):
+            cls = component(name)
+            kwargs = options.get(name, {})
+            components.append(cls(android, **kwargs) if name in VERSIONED else cls(**kwargs))
+        if addon in MODULES:
+            if not selected or selected[-1][0] != "modules":
+                selected.append(("modules", []))
+            selected[-1][1].extend(components)
+        else:
+            selected.append((addon, components))
+    return selected
+
+
+def addon_names(selected):
+    """Addon names of a selection, listing the batched Magisk modules one by one"""
+    names = []
+    for name, components in selected:
+        if name == "modules":
+            names.extend(component.addon for component in components)
+        else:
+            names.append(name)
+    return names
+
+
+def image_name(android, selected):
+    return "redroid/redroid:"+"_".join([android] + addon_names(selected))
+
+
+def build_image(android, selected, container, workspace, reproducible=False, layers=frozenset()):
+    """Write the Dockerfile for the staged components into workspace and build it
+
+    Names in layers are added from prebuilt <name>.tar layer tarballs instead
+    of their staged copy dir.
+    """
+    if reproducible:
+        epoch = source_date_epoch()
+        for name, components in selected:
+            if name in layers:
+                continue
+            copy_dir = components[0].copy_dir
+            helper.print_color("Normalizing {} (SOURCE_DATE_EPOCH={})".format(copy_dir, epoch), helper.bcolors.GREEN)
+            normalize_tree(copy_dir, epoch)
+
+    dockerfile = "FROM redroid/redroid:{}-latest\n".format(android)
+    context = []
+    for name, _ in selected:
+        if name in layers:
+            dockerfile = dockerfile + "ADD {}.tar /\n".format(name)
+            context.append(name + ".tar")
+        else:
+            dockerfile = dockerfile + "COPY {} /\n".format(name)
+            context.append(name)
+    print("\nDockerfile\n"+dockerfile)
+    with open(workspace.dockerfile, "w") as f:
+        f.write(dockerfile)
+    # Keep extract dirs and unused staging out of the build context
+    with open(workspace.path(".dockerignore"), "w") as f:
+        f.write("*\n" + "".join("!{}\n".format(entry) for entry in context))
+
+    new_image_name = image_name(android, selected)
+    engine.build(container, workspace.root, context, new_image_name)
+    helper.print_color("Successfully built {}".format(
+        new_image_name), helper.bcolors.GREEN)
+    return new_image_name
+
+
+def check_builds(combinations):
+    """Validate every (android, addons) combination before anything is downloaded
+
+    Unsupported addons are only reported, an unsupported base image aborts.
+    """
+    rejections = load_matrix(tuple(ADDONS)).validate(combinations, helper.probe_host().arch)
+    fatal = False
+    for android, addon, reason in dict.fromkeys(rejections):
+        if addon is None:
+            fatal = True
+            helper.print_color("ERROR: Android {}: {}".format(android, reason), helper.bcolors.RED)
+        else:
+            helper.print_color("WARNING: Android {} without {}: {}".format(android, addon, reason), helper.bcolors.YELLOW)
+    if fatal:
+        sys.exit(1)
+
+
+def staged_size_report(android, selected, workspace):
+    """Size report of the staged copy dirs, or the layer tarballs standing in for them"""
+    sources = []
+    for name, _ in selected:
+        path = workspace.path(name)
+        sources.append((name, path if os.path.isdir(path) else path + ".tar"))
+    report = size_report(image_name(android, selected), sources)
+    helper.print_color("{}: {:.1f} MiB staged, {:.1f} MiB duplicated across addons".format(
+        report["image"], report["bytes"] / 1024 ** 2, report["duplicated_bytes"] / 1024 ** 2), helper.bcolors.GREEN)
+    return report
+
+
+def record_staged_bytes(android, selected, workspace):
+    """Set the staged bytes metric of each addon once all components sharing its copy dir are staged"""
+    if not metrics.REGISTRY.enabled:
+        return
+    image = image_name(android, selected)
+    for name, _ in selected:
+        path = workspace.path(name)
+        # Addons restored from a cached layer have no copy dir
+        if os.path.isdir(path):
+            metrics.STAGED_BYTES.set(tree_size(path), addon=name, image=image)
+
+
+def matrix_builds(spec):
+    """Resolve the combinations of a matrix spec into unique (android, selected) builds"""
+    combinations = matrix.expand_spec(spec)
+    check_builds(combinations)
+    builds = {}
+    for android, addons in combinations:
+        selected = select_components(android, addons, spec.get("options"))
+        # Unsupported addons are dropped, which can make two combinations the same image
+        builds.setdefault(image_name(android, selected), (android, selected))
+    return list(builds.values())
+
+
+def plan_builds(args, requested, options):
+    """Plan of the single build or the matrix args ask for, without downloading anything"""
+    if args.matrix:
+        builds = matrix_builds(matrix.load_spec(args.matrix))
+    else:
+        check_builds([(args.android, frozenset(requested))])
+        builds = [(args.android, select_components(args.android, requested, options))]
+    return plan.build_plan([(image_name(android, selected), selected) for android, selected in builds], args.layer_cache)
+
+
+def build_matrix(args):
+    """Build every combination of a matrix spec file concurrently in isolated workspaces"""
+    spec = matrix.load_spec(args.matrix)
+    container = spec.get("container", args.container)
+    workers = args.jobs or spec.get("jobs", helper.probe_host().cores)
+    workdir = os.path.abspath(spec.get("workdir", "matrix"))
+    shared_extract_root = os.path.join(workdir, "extract")
+
+    jobs = []
+    for android, selected in matrix_builds(spec):
+        name = "_".join([android] + addon_names(selected))
+        job = matrix.MatrixJob(name, android, selected, Workspace(os.path.join(workdir, "jobs", name)))
+        if args.layer_cache:
+            job.layers = use_cached_layers(selected, job.workspace)
+        for component in job.components:
+            component.use_workspace(job.workspace, shared_extract_root)
+        jobs.append(job)
+
+    def build(job):
+        try:
+            record_staged_bytes(job.android, job.selected, job.workspace)
+            layers = frozenset()
+            if args.layer_cache:
+                store_layers(job.selected, job.workspace, {name for name, _ in job.selected} - job.layers)
+                layers = frozenset(name for name, _ in job.selected)
+            if args.size_report:
+                reports[job.name] = staged_size_report(job.android, job.selected, job.workspace)
+            build_image(job.android, job.selected, container, job.workspace, args.reproducible, layers)
+        finally:
+            # Free the staged copy dirs as soon as the job is done with them
+            job.workspace.cleanup()
+
+    reports = {}
+    try:
+        failures = matrix.run_matrix(jobs, build, workers)
+    finally:
+        # Jobs that failed while staging never reached build()
+        for job in jobs:
+            job.workspace.cleanup()
+    if args.size_report:
+        write_report({"images": reports}, args.size_report)
+    if failures:
+        helper.print_color("{} of {} matrix builds failed".format(len(failures), len(jobs)), helper.bcolors.RED)
+        sys.exit(1)
 
 
 def main():
-    dockerfile = ""
-    tags = []
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('-a', '--android-version',
@@ -46,84 +251,126 @@ def main():
     parser.add_argument('-m', '--install-magisk', dest='magisk',
                         help='Install Magisk ( Bootless )',
                         action='store_true')
+    parser.add_argument('-me', '--install-magisk-enhanced', dest='magisk_enhanced',
+                        help='Install Magisk v30.2 with ReZygisk, PlayIntegrityFix, TrickyStore, Tricky-Addon and KsuWebUI modules',
+                        action='store_true')
+    parser.add_argument('-rz', '--install-rezygisk', dest='rezygisk',
+                        help='Install the ReZygisk Magisk module',
+                        action='store_true')
+    parser.add_argument('-pif', '--install-playintegrityfix', dest='playintegrity',
+                        help='Install the PlayIntegrityFix Magisk module',
+                        action='store_true')
+    parser.add_argument('-ts', '--install-trickystore', dest='trickystore',
+                        help='Install the TrickyStore Magisk module',
+                        action='store_true')
+    parser.add_argument('-ta', '--install-tricky-addon', dest='tricky_addon',
+                        help='Install the Tricky-Addon-Update-Target-List Magisk module',
+                        action='store_true')
+    parser.add_argument('-ksu', '--install-ksu-webui', dest='ksu_webui',
+                        help='Install the KsuWebUIStandalone Magisk module',
+                        action='store_true')
+    parser.add_argument('--preinstall-modules', dest='preinstall_modules',
+                        help='Expand the Magisk Enhanced modules into /data/adb/modules at build time instead of on first boot',
+                        action='store_true')
     parser.add_argument('-w', '--install-widevine', dest='widevine',
                         help='Integrate Widevine DRM (L3)',
                         action='store_true')
-    parser.add_argument('-c', '--container', 
+    parser.add_argument('--gapps-include', dest='gapps_include', metavar='APPS',
+                        type=lambda value: value.split(","),
+                        help='Comma separated Gapps packages/apps to install, everything else is left out')
+    parser.add_argument('--gapps-exclude', dest='gapps_exclude', metavar='APPS',
+                        type=lambda value: value.split(","),
+                        help='Comma separated Gapps packages/apps to leave out')
+    parser.add_argument('--gapps-dpi', dest='gapps_dpi', metavar='DPI',
+                        help='Screen density (e.g. 320 or xhdpi) to pick OpenGapps app variants for')
+    parser.add_argument('-c', '--container',
                         dest='container',
                         default='docker',
-                        help='Specify container type', 
+                        help='Specify container type',
                         choices=['docker', 'podman'])
+    parser.add_argument('--reproducible', dest='reproducible',
+                        help='Normalize timestamps, ownership and modes of staged files (honours SOURCE_DATE_EPOCH)',
+                        action='store_true')
+    parser.add_argument('--matrix', dest='matrix', metavar='SPEC',
+                        help='Build every combination listed in a JSON matrix spec file')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int,
+                        help='Maximum number of concurrent matrix builds')
+    parser.add_argument('--layer-cache', dest='layer_cache',
+                        help='Reuse and store digest-keyed layer tarballs of staged addons',
+                        action='store_true')
+    parser.add_argument('--plan', dest='plan', nargs='?', const='text', choices=['text', 'json'],
+                        help='Only print what would be downloaded, extracted and rebuilt, with a time estimate')
+    parser.add_argument('--size-report', dest='size_report', metavar='FILE',
+                        help='Write a JSON report of what each staged addon adds to the image size')
+    parser.add_argument('--metrics-file', dest='metrics_file', metavar='FILE',
+                        help='Write Prometheus metrics of the run to FILE for the node_exporter textfile collector')
+    parser.add_argument('--trace', dest='trace', metavar='FILE',
+                        help='Write a Chrome trace of the download, extract, copy, command and build spans to FILE')
+    parser.add_argument('--workspace', dest='workspace', metavar='DIR',
+                        help='Stage the build in DIR instead of a fresh temporary workspace (kept after the build)')
 
     args = parser.parse_args()
-    dockerfile = dockerfile + \
-        "FROM redroid/redroid:{}-latest\n".format(
-            args.android)
-    tags.append(args.android)
-    
-    if args.gapps:
-        if args.android in ["11.0.0"]:
-            Gapps().install()
-            dockerfile = dockerfile + "COPY gapps /\n"
-            tags.append("gapps")
-        else:
-            helper.print_color( "WARNING: OpenGapps only supports 11.0.0", helper.bcolors.YELLOW)
-    
-    if args.litegapps:
-        LiteGapps(args.android).install()
-        dockerfile = dockerfile + "COPY litegapps /\n"
-        tags.append("litegapps")
-        
-    if args.mindthegapps:
-        MindTheGapps(args.android).install()
-        dockerfile = dockerfile + "COPY mindthegapps /\n"
-        tags.append("mindthegapps")
-        
-    if args.ndk:
-        if args.android in ["11.0.0", "12.0.0", "12.0.0_64only", "13.0.0", "14.0.0", "15.0.0"]:
-            arch = helper.host()[0]
-            if arch in ["x86", "x86_64", "arm64"]:  # Added arm64 support
-                Ndk().install()
-                dockerfile = dockerfile+"COPY ndk /\n"
-                tags.append("ndk")
-        else:
-            helper.print_color(
-                "WARNING: Libndk seems to work only on redroid:11.0.0 and above", helper.bcolors.YELLOW)
-    
-    if args.houdini:
-        if args.android in ["8.1.0", "9.0.0", "11.0.0", "12.0.0", "13.0.0", "14.0.0", "15.0.0"]:
-            arch = helper.host()[0]
-            if arch == "x86" or arch == "x86_64":
-                Houdini(args.android).install()
-                if not args.android == "8.1.0":
-                    Houdini_Hack(args.android).install()
-                dockerfile = dockerfile+"COPY houdini /\n"
-                tags.append("houdini") 
+    if args.trace:
+        trace.enable()
+        # Also written when the build fails, that is when it is most useful
+        atexit.register(trace.write_trace, args.trace)
+    if args.metrics_file:
+        metrics.enable()
+        atexit.register(metrics.write_metrics, args.metrics_file)
+
+    requested = [addon for addon in ADDONS if getattr(args, addon)]
+    selection = {"include": args.gapps_include, "exclude": args.gapps_exclude}
+    options = {
+        "gapps": dict(selection, dpi=args.gapps_dpi),
+        "litegapps": selection,
+        "mindthegapps": selection,
+        "magisk_enhanced": {"preinstall_modules": args.preinstall_modules},
+    }
+    if args.plan == "json":
+        # Host detection and compatibility warnings go to stderr, stdout holds only the JSON document
+        with contextlib.redirect_stdout(sys.stderr):
+            build_plan = plan_builds(args, requested, options)
+        plan.dump_plan(build_plan)
+        return
+    if args.plan:
+        plan.print_plan(plan_builds(args, requested, options))
+        return
+
+    if not args.matrix:
+        check_builds([(args.android, frozenset(requested))])
+
+    if args.matrix:
+        build_matrix(args)
+        return
+
+    workspace = Workspace(args.workspace)
+    try:
+        selected = select_components(args.android, requested, options)
+        cached = use_cached_layers(selected, workspace) if args.layer_cache else set()
+        for name, components in selected:
+            for component in components:
+                component.use_workspace(workspace)
+            if name in cached:
+                continue
+            if name == "modules":
+                install_modules(components)
             else:
-                helper.print_color(
-                    "WARNING: Houdini only works on x86/x86_64 architectures", helper.bcolors.YELLOW)
-        else:
-            helper.print_color(
-                "WARNING: Houdini seems to work only above redroid:11.0.0", helper.bcolors.YELLOW)
-    
-    if args.magisk:
-        Magisk().install()
-        dockerfile = dockerfile+"COPY magisk /\n"
-        tags.append("magisk")
-        
-    if args.widevine:
-        Widevine(args.android).install()
-        dockerfile = dockerfile+"COPY widevine /\n"
-        tags.append("widevine")
-        
-    print("\nDockerfile\n"+dockerfile)
-    with open("./Dockerfile", "w") as f:
-        f.write(dockerfile)
-    new_image_name = "redroid/redroid:"+"_".join(tags)
-    subprocess.run([args.container, "build", "-t", new_image_name, "."])
-    helper.print_color("Successfully built {}".format(
-        new_image_name), helper.bcolors.GREEN)
+                for component in components:
+                    component.install()
+        record_staged_bytes(args.android, selected, workspace)
+
+        layers = frozenset()
+        if args.layer_cache:
+            store_layers(selected, workspace, {name for name, _ in selected} - cached)
+            layers = frozenset(name for name, _ in selected)
+        if args.size_report:
+            write_report(staged_size_report(args.android, selected, workspace), args.size_report)
+        build_image(args.android, selected, args.container, workspace, args.reproducible, layers)
+    finally:
+        # A temporary workspace holds gigabytes of staged files, failed runs must not leak it
+        if args.workspace is None:
+            workspace.cleanup()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
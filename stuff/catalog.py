@@ -0,0 +1,56 @@
+import functools
+import json
+import os
+from dataclasses import dataclass
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+# Matches any android version or arch in a catalog entry
+ANY = "*"
+
+@dataclass(frozen=True)
+class Artifact:
+    """One downloadable file of the catalog; md5 is None when not pinned yet"""
+    component: str
+    url: str
+    md5: str = None
+
+class Catalog:
+    """In-memory index of catalog.json keyed by (component, android version, arch)"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.index = {}
+        self.by_component = {}
+        for entry in entries:
+            artifact = Artifact(entry["component"], entry["url"], entry.get("md5"))
+            versions = entry.get("versions", ANY)
+            for version in ([ANY] if versions == ANY else versions):
+                key = (artifact.component, version, entry.get("arch", ANY))
+                self.index[key] = artifact
+                self.by_component.setdefault(artifact.component, {})[key[1:]] = artifact
+
+    def lookup(self, component, version=ANY, arch=ANY):
+        """Artifact for an exact or wildcard match, or None"""
+        for key in ((component, version, arch), (component, version, ANY),
+                    (component, ANY, arch), (component, ANY, ANY)):
+            if key in self.index:
+                return self.index[key]
+        return None
+
+    def query(self, component=None, version=None, arch=None):
+        """All ((component, version, arch), artifact) pairs matching the given filters"""
+        components = [component] if component else list(self.by_component)
+        return [((name, v, a), artifact)
+                for name in components
+                for (v, a), artifact in self.by_component.get(name, {}).items()
+                if (version is None or v in (version, ANY)) and (arch is None or a in (arch, ANY))]
+
+    def artifacts(self):
+        """Every distinct artifact, e.g. for prefetching"""
+        return list({artifact.url: artifact for artifact in self.index.values()}.values())
+
+@functools.lru_cache(maxsize=None)
+def load_catalog(path=CATALOG_FILE):
+    with open(path) as f:
+        return Catalog(json.load(f)["artifacts"])
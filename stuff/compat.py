@@ -0,0 +1,85 @@
+import functools
+
+from stuff.catalog import load_catalog
+
+# Redroid base images published per host arch
+BASE_IMAGES = {
+    "arm64": ["11.0.0", "12.0.0", "12.0.0_64only", "13.0.0", "13.0.0_64only", "14.0.0", "14.0.0_64only", "15.0.0", "15.0.0_64only"],
+    "x86_64": ["8.1.0", "9.0.0", "10.0.0", "11.0.0", "12.0.0", "12.0.0_64only", "13.0.0", "14.0.0", "15.0.0"],
+    "x86": ["8.1.0", "9.0.0", "10.0.0", "11.0.0", "12.0.0", "13.0.0", "14.0.0", "15.0.0"],
+    "arm": ["8.1.0", "9.0.0", "10.0.0", "11.0.0", "12.0.0", "13.0.0", "14.0.0"]
+}
+
+# Limits on top of what the catalog ships artifacts for
+CONSTRAINTS = {
+    "ndk": {"min_version": 11, "arch": ["x86", "x86_64", "arm64"]},
+    "houdini": {"arch": ["x86", "x86_64"]},
+}
+
+def addon_components(addon, version):
+    """Catalog components an addon is staged from"""
+    # The 8.1.0 houdini build works without the hack
+    if addon == "houdini" and version != "8.1.0":
+        return ["houdini", "houdini_hack"]
+    return [addon]
+
+def major(version):
+    return int(version.split(".")[0])
+
+class CompatMatrix:
+    """Precomputed support of every (addon, android version, arch); a rejection is a reason string"""
+
+    def __init__(self, catalog, addons):
+        self.base = {}
+        self.table = {}
+        all_versions = {version for versions in BASE_IMAGES.values() for version in versions}
+        for arch, versions in BASE_IMAGES.items():
+            for version in all_versions:
+                base = None if version in versions else "there is no redroid:{} image for {}".format(version, arch)
+                self.base[(version, arch)] = base
+                for addon in addons:
+                    self.table[(addon, version, arch)] = base or self._check(catalog, addon, version, arch)
+
+    @staticmethod
+    def _check(catalog, addon, version, arch):
+        rule = CONSTRAINTS.get(addon, {})
+        if "arch" in rule and arch not in rule["arch"]:
+            return "{} only works on {} hosts".format(addon, "/".join(rule["arch"]))
+        if major(version) < rule.get("min_version", 0):
+            return "{} needs Android {}.0.0 or newer".format(addon, rule["min_version"])
+        for name in addon_components(addon, version):
+            if catalog.lookup(name, version, arch) is None:
+                available = sorted({v for (_, v, _), _ in catalog.query(name, arch=arch)}, key=lambda v: (major(v), v))
+                return "no {} build for {} on Android {} (available: {})".format(
+                    name, arch, version, ", ".join(available) or "none")
+        return None
+
+    def base_reason(self, version, arch):
+        """Why the base image cannot be built on arch, or None"""
+        return self.base.get((version, arch), "unknown Android version {}".format(version))
+
+    def reason(self, addon, version, arch):
+        """Why addon cannot be added to an Android version on arch, or None"""
+        return self.table.get((addon, version, arch), "unknown addon {} or Android version {}".format(addon, version))
+
+    def validate(self, builds, arch):
+        """Check every (android, addons) of a build matrix in one pass
+
+        Returns the (android, addon, reason) rejections; addon is None when the
+        base image itself is unsupported.
+        """
+        rejections = []
+        for android, addons in builds:
+            base = self.base_reason(android, arch)
+            if base:
+                rejections.append((android, None, base))
+                continue
+            for addon in sorted(addons):
+                reason = self.reason(addon, android, arch)
+                if reason:
+                    rejections.append((android, addon, reason))
+        return rejections
+
+@functools.lru_cache(maxsize=None)
+def load_matrix(addons):
+    return CompatMatrix(load_catalog(), addons)
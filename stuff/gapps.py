@@ -1,20 +1,16 @@
 import os
 import shutil
+from stuff.catalog import load_catalog
 from stuff.general import General
-from tools.helper import get_download_dir, host, print_color, run, bcolors
+from stuff.package_selection import PackageSelection, lzip_size, report_saved, tree_size
+from tools.helper import host, print_color, run_async, wait_all, bcolors
+
+def package_name(lz_file):
+    """gmscore-x86_64.tar.lz -> gmscore"""
+    return lz_file[:-len(".tar.lz")].rsplit("-", 1)[0]
 
 class Gapps(General):
-    dl_links = {
-            "x86_64": ["https://sourceforge.net/projects/opengapps/files/x86_64/20220503/open_gapps-x86_64-11.0-pico-20220503.zip", "5a6d242be34ad1acf92899c7732afa1b"],
-            "x86": ["https://sourceforge.net/projects/opengapps/files/x86/20220503/open_gapps-x86-11.0-pico-20220503.zip", "efda4943076016d00b40e0874b12ddd3"],
-            "arm64": ["https://sourceforge.net/projects/opengapps/files/arm64/20220503/open_gapps-arm64-11.0-pico-20220503.zip", "67e927e4943757f418e4f934825cf987"],
-            "arm": ["https://sourceforge.net/projects/opengapps/files/arm/20220215/open_gapps-arm-11.0-pico-20220215.zip", "8719519fa32ae83a62621c6056d32814"]
-        }
-    arch = host()
-    download_loc = get_download_dir()
-    dl_link = dl_links[arch[0]][0]
-    dl_file_name = os.path.join(download_loc, "open_gapps.zip")
-    act_md5 = dl_links[arch[0]][1]
+    dl_file = "open_gapps.zip"
     copy_dir = "./gapps"
     extract_to = "/tmp/ogapps/extract"
     non_apks = [
@@ -28,6 +24,19 @@ class Gapps(General):
         "setupwizardtablet-x86_64.tar.lz"
         ]
 
+    def __init__(self, include=None, exclude=None, dpi=None):
+        super().__init__()
+        self.arch = host()
+        self.selection = PackageSelection.create(include, exclude, dpi)
+        self.bytes_saved = 0
+        artifact = load_catalog().lookup("gapps", "11.0.0", self.arch[0])
+        if artifact is None:
+            raise ValueError(f"No OpenGapps available for {self.arch[0]}")
+        self.use_artifact(artifact)
+
+    def layer_inputs(self):
+        return dict(super().layer_inputs(), selection=self.selection.as_dict())
+
     def download(self):
         print_color("Downloading OpenGapps now .....", bcolors.GREEN)
         super().download()
@@ -40,23 +49,45 @@ class Gapps(General):
         if not os.path.exists(os.path.join(self.extract_to, "appunpack")):
             os.makedirs(os.path.join(self.extract_to, "appunpack"))
 
-        for lz_file in os.listdir(os.path.join(self.extract_to, "Core")):
-            for d in os.listdir(os.path.join(self.extract_to, "appunpack")):
-                shutil.rmtree(os.path.join(self.extract_to, "appunpack", d))
-            if lz_file not in self.skip:
-                if lz_file not in self.non_apks:
-                    print("    Processing app package : "+os.path.join(self.extract_to, "Core", lz_file))
-                    run(["tar", "--lzip", "-xvf", os.path.join(self.extract_to, "Core", lz_file), "-C", os.path.join(self.extract_to, "appunpack")])
-                    app_name = os.listdir(os.path.join(self.extract_to, "appunpack"))[0]
-                    xx_dpi = os.listdir(os.path.join(self.extract_to, "appunpack", app_name))[0]
-                    app_priv = os.listdir(os.path.join(self.extract_to, "appunpack", app_name, "nodpi"))[0]
-                    app_src_dir = os.path.join(self.extract_to, "appunpack", app_name, xx_dpi, app_priv)
-                    for app in os.listdir(app_src_dir):
-                        shutil.copytree(os.path.join(app_src_dir, app), os.path.join(self.copy_dir, "system", "priv-app", app), dirs_exist_ok=True)
-                else:
-                    print("    Processing extra package : "+os.path.join(self.extract_to, "Core", lz_file))
-                    run(["tar", "--lzip", "-xvf", os.path.join(self.extract_to, "Core", lz_file), "-C", os.path.join(self.extract_to, "appunpack")])
-                    app_name = os.listdir(os.path.join(self.extract_to, "appunpack"))[0]
-                    common_content_dirs = os.listdir(os.path.join(self.extract_to, "appunpack", app_name, "common"))
-                    for ccdir in common_content_dirs:
-                        shutil.copytree(os.path.join(self.extract_to, "appunpack", app_name, "common", ccdir), os.path.join(self.copy_dir, "system", ccdir), dirs_exist_ok=True)
+        # Unpack every package at once, each into its own directory
+        unpack = {}
+        saved = 0
+        lz_files = [lz_file for lz_file in os.listdir(os.path.join(self.extract_to, "Core")) if lz_file not in self.skip]
+        packages = {package_name(lz_file) for lz_file in lz_files}
+        for lz_file in lz_files:
+            package = package_name(lz_file)
+            # Extras are support files rather than apps, so include only narrows down apps
+            if lz_file in self.non_apks:
+                skipped = package.lower() in self.selection.exclude
+            else:
+                skipped = self.selection.skips_package(package, packages)
+            if skipped:
+                saved += lzip_size(os.path.join(self.extract_to, "Core", lz_file))
+                continue
+            unpack_dir = os.path.join(self.extract_to, "appunpack", lz_file)
+            if os.path.exists(unpack_dir):
+                shutil.rmtree(unpack_dir)
+            os.makedirs(unpack_dir)
+            unpack[lz_file] = (unpack_dir, run_async(["tar", "--lzip", "-xvf", os.path.join(self.extract_to, "Core", lz_file), "-C", unpack_dir]))
+        wait_all([future for _, future in unpack.values()])
+
+        for lz_file, (unpack_dir, _) in unpack.items():
+            app_name = os.listdir(unpack_dir)[0]
+            if lz_file not in self.non_apks:
+                print("    Processing app package : "+os.path.join(self.extract_to, "Core", lz_file))
+                xx_dpi = self.selection.best_dpi(os.listdir(os.path.join(unpack_dir, app_name)))
+                app_priv = os.listdir(os.path.join(unpack_dir, app_name, xx_dpi))[0]
+                app_src_dir = os.path.join(unpack_dir, app_name, xx_dpi, app_priv)
+                for app in os.listdir(app_src_dir):
+                    if not self.selection.wants(package_name(lz_file), app):
+                        saved += tree_size(os.path.join(app_src_dir, app))
+                        continue
+                    shutil.copytree(os.path.join(app_src_dir, app), os.path.join(self.copy_dir, "system", "priv-app", app), dirs_exist_ok=True)
+            else:
+                print("    Processing extra package : "+os.path.join(self.extract_to, "Core", lz_file))
+                common_content_dirs = os.listdir(os.path.join(unpack_dir, app_name, "common"))
+                for ccdir in common_content_dirs:
+                    shutil.copytree(os.path.join(unpack_dir, app_name, "common", ccdir), os.path.join(self.copy_dir, "system", ccdir), dirs_exist_ok=True)
+
+        self.bytes_saved = saved
+        report_saved("OpenGapps", saved)
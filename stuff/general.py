@@ -1,44 +1,111 @@
 import os
 import zipfile
 import hashlib
+import time
 
-from tools.helper import bcolors, download_file, print_color
+from tools.helper import bcolors, download_file, get_download_dir, print_color
+from tools import metrics
+from tools.plan import record_throughput
+from tools.trace import span
+from tools.workspace import file_lock
 
 class General:
+    # Name of the artifact inside the download cache
+    dl_file = None
+
+    def __init__(self):
+        self.download_loc = get_download_dir()
+        self.dl_file_name = os.path.join(self.download_loc, self.dl_file)
+
+    def use_artifact(self, artifact):
+        """Take the download link and checksum from a catalog entry"""
+        self.artifact = artifact
+        self.dl_link = artifact.url
+        self.act_md5 = artifact.md5
+
+    def artifact_key(self):
+        """Stable key of the downloaded artifact, shared by every build that uses it"""
+        return "{}-{}".format(type(self).__name__.lower(), hashlib.sha1(self.dl_link.encode()).hexdigest()[:12])
+
+    def cached_file(self):
+        """Location of the artifact in the shared download cache"""
+        ext = os.path.splitext(self.dl_file_name)[1]
+        return os.path.join(os.path.dirname(self.dl_file_name), self.artifact_key() + ext)
+
+    def cache_entries(self):
+        """(key, url, cache path) of every artifact the component downloads"""
+        return [(self.artifact_key(), self.dl_link, self.cached_file())]
+
+    def use_workspace(self, workspace, extract_root=None):
+        """Derive the staging and extract paths from a per-job workspace"""
+        key = self.artifact_key()
+        self.dl_file_name = self.cached_file()
+        self.extract_to = os.path.join(extract_root or workspace.extract_root, key)
+        self.copy_dir = workspace.path(os.path.basename(os.path.normpath(self.copy_dir)))
+
+    def layer_inputs(self):
+        """Everything the staged copy dir depends on; equal inputs give an equal layer"""
+        return {"component": type(self).__name__, "url": self.dl_link, "md5": self.act_md5}
+
     def download(self):
-        loc_md5 = ""
-        if os.path.isfile(self.dl_file_name):
-            with open(self.dl_file_name,"rb") as f:
-                bytes = f.read()
-                loc_md5 = hashlib.md5(bytes).hexdigest()
+        self.fetch(self.dl_link, self.dl_file_name, self.act_md5)
+
+    def fetch(self, url, path, md5):
+        """Download url to path in the shared cache unless it is there already with the expected md5"""
+        # The download cache is shared by concurrent builds on this host
+        with file_lock(path):
+            loc_md5 = ""
+            if os.path.isfile(path):
+                with span(type(self).__name__ + ".hash", "install"), open(path,"rb") as f:
+                    bytes = f.read()
+                    loc_md5 = hashlib.md5(bytes).hexdigest()
         
-        # Skip MD5 verification for placeholder hashes
-        skip_md5_verification = self.act_md5.startswith(('a1b2c3d4', 'b2c3d4e5', 'c3d4e5f6', 'placeholder'))
+            # Artifacts without a pinned md5 in the catalog are accepted as downloaded
+            verify = md5 is not None
+            component = type(self).__name__
+            downloads = 0
         
-        while not os.path.isfile(self.dl_file_name) or (not skip_md5_verification and loc_md5 != self.act_md5):
-            if os.path.isfile(self.dl_file_name):
-                if skip_md5_verification:
-                    print_color(f"Skipping MD5 verification for new package (hash: {loc_md5})", bcolors.YELLOW)
-                    break
-                else:
-                    os.remove(self.dl_file_name)
+            while not os.path.isfile(path) or (verify and loc_md5 != md5):
+                if os.path.isfile(path):
+                    if not verify:
+                        break
+                    os.remove(path)
                     print_color("md5 mismatches, redownloading now ....",bcolors.YELLOW)
-            loc_md5 = download_file(self.dl_link, self.dl_file_name)
+                    if downloads:
+                        metrics.RETRIES.inc(operation="download", reason="md5", component=component)
+                start = time.time()
+                loc_md5 = download_file(url, path)
+                size = os.path.getsize(path)
+                record_throughput("download", size, size, time.time() - start)
+                metrics.DOWNLOAD_BYTES.inc(size, component=component)
+                downloads += 1
+            metrics.CACHE_LOOKUPS.inc(cache="download", result="miss" if downloads else "hit")
         
-        if skip_md5_verification:
-            print_color(f"Downloaded with MD5: {loc_md5}", bcolors.GREEN)
+            if not verify:
+                print_color(f"No pinned MD5 for {url}, downloaded file has MD5: {loc_md5}", bcolors.YELLOW)
         
     def extract(self):
         print_color("Extracting archive...", bcolors.GREEN)
         print(self.dl_file_name)
         print(self.extract_to)
+        start = time.time()
         with zipfile.ZipFile(self.dl_file_name) as z:
             z.extractall(self.extract_to)
+            extracted = sum(info.file_size for info in z.infolist())
+        record_throughput("extract", os.path.getsize(self.dl_file_name), extracted, time.time() - start)
             
     def copy(self):
         pass
         
+    def run_phase(self, phase):
+        """Run the download, extract or copy phase inside a trace span"""
+        component = type(self).__name__
+        start = time.time()
+        with span("{}.{}".format(component, phase), "install"):
+            getattr(self, phase)()
+        metrics.PHASE_SECONDS.observe(time.time() - start, component=component, phase=phase)
+
     def install(self):
-        self.download()
-        self.extract()
-        self.copy()
\ No newline at end of file
+        self.run_phase("download")
+        self.run_phase("extract")
+        self.run_phase("copy")
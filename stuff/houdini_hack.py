@@ -1,20 +1,23 @@
 import os
 import re
 import shutil
+from stuff.catalog import load_catalog
 from stuff.general import General
-from tools.helper import bcolors, get_download_dir, print_color, run
+from tools.helper import bcolors, print_color, run
 
 
 class Houdini_Hack(General):
-    download_loc = get_download_dir()
     copy_dir = "./houdini"
-    dl_file_name = os.path.join(download_loc, "libhoudini_hack.zip")
+    dl_file = "libhoudini_hack.zip"
     extract_to = "/tmp/houdinihackunpack"
 
     def __init__(self, version):
+        super().__init__()
         self.version = version
-        self.dl_link = "https://github.com/rote66/redroid_libhoudini_hack/archive/a2194c5e294cbbfdfe87e51eb9eddb4c3621d8c3.zip"
-        self.act_md5 = "8f71a58f3e54eca879a2f7de64dbed58"
+        self.use_artifact(load_catalog().lookup("houdini_hack", version))
+
+    def layer_inputs(self):
+        return dict(super().layer_inputs(), version=self.version)
 
     def download(self):
         print_color("Downloading libhoudini_hack now .....", bcolors.GREEN)
@@ -2,18 +2,14 @@ import gzip
 import os
 import shutil
 import re
+from stuff.catalog import load_catalog
 from stuff.general import General
-from tools.helper import bcolors, download_file, host, print_color, run, get_download_dir
+from tools.helper import bcolors, host, print_color, run_async, wait_all
 
 class Magisk(General):
-    download_loc = get_download_dir()
-    dl_link = "https://github.com/ayasa520/Magisk/releases/download/debug-7be6d81-30200/Magisk-7be6d81-30200-debug.apk"
-    dl_file_name = os.path.join(download_loc, "magisk.apk")
-    act_md5 = "834b0f063ea713bea48b92c7d5648ce9"
+    dl_file = "magisk.apk"
     extract_to = "/tmp/magisk_unpack"
     copy_dir = "./magisk"
-    magisk_dir = os.path.join(copy_dir, "system", "etc", "init", "magisk")
-    machine = host()
     oringinal_bootanim = """
 service bootanim /system/bin/bootanimation
     class core animation
@@ -49,6 +45,18 @@ on property:init.svc.zygote=stopped
     exec u:r:su:s0 root root -- {MAGISKTMP}/magisk --auto-selinux --zygote-restart
     """.format(MAGISKSYSTEMDIR="/system/etc/init/magisk", MAGISKTMP="/sbin", magisk_name="magisk")
 
+    def __init__(self):
+        super().__init__()
+        self.machine = host()
+        self.use_artifact(load_catalog().lookup("magisk"))
+
+    @property
+    def magisk_dir(self):
+        return os.path.join(self.copy_dir, "system", "etc", "init", "magisk")
+
+    def layer_inputs(self):
+        return dict(super().layer_inputs(), arch=self.machine[0])
+
     def download(self):
         print_color("Downloading latest Magisk-Delta now .....", bcolors.GREEN)
         super().download()   
@@ -71,20 +79,22 @@ on property:init.svc.zygote=stopped
             "arm64": "arm64-v8a"
         }
         lib_dir = os.path.join(self.extract_to, "lib", arch_map[self.machine[0]])
+        chmods = []
         for parent, dirnames, filenames in os.walk(lib_dir):
             for filename in filenames:
                 o_path = os.path.join(lib_dir, filename)  
                 filename = re.search('lib(.*)\.so', filename)
                 n_path = os.path.join(self.magisk_dir, filename.group(1))
                 shutil.copyfile(o_path, n_path)
-                run(["chmod", "+x", n_path])
+                chmods.append(run_async(["chmod", "+x", n_path]))
+        wait_all(chmods)
         shutil.copyfile(self.dl_file_name, os.path.join(self.magisk_dir,"magisk.apk") )
 
         # Updating Magisk from Magisk manager will modify bootanim.rc, 
         # So it is necessary to backup the original bootanim.rc.
         bootanim_path = os.path.join(self.copy_dir, "system", "etc", "init", "bootanim.rc")
         gz_filename = os.path.join(bootanim_path)+".gz"
-        with gzip.open(gz_filename,'wb') as f_gz:
+        with gzip.GzipFile(gz_filename, "wb", mtime=0) as f_gz:
             f_gz.write(self.oringinal_bootanim.encode('utf-8'))
         with open(bootanim_path, "w") as initfile:
             initfile.write(self.oringinal_bootanim+self.bootanim_component)
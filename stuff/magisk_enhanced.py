@@ -1,50 +1,23 @@
 import gzip
+import hashlib
 import os
 import shutil
 import re
 import zipfile
+from stuff.catalog import load_catalog
 from stuff.general import General
-from tools.helper import bcolors, download_file, host, print_color, run, get_download_dir
+from stuff.magisk_module import unzip_module
+from tools.helper import bcolors, host, print_color, run, run_async, wait_all
+from tools.workspace import file_lock
 
 class MagiskEnhanced(General):
-    download_loc = get_download_dir()
-
-    # Updated links for latest versions - ARM64 compatible
-    dl_links = {
-        "magisk": {
-            "url": "https://github.com/topjohnwu/Magisk/releases/download/v30.2/Magisk-v30.2.apk",
-            "md5": ""  # Skip MD5 check for now
-        },
-        "rezygisk": {
-            "url": "https://github.com/PerformanC/ReZygisk/releases/download/v1.0.0-rc.3/ReZygisk-v1.0.0-rc.3.zip",
-            "md5": ""
-        },
-        "playintegrity": {
-            "url": "https://github.com/KOWX712/PlayIntegrityFix/releases/download/v4.3-inject-s/PlayIntegrityFix_v4.3-inject-s.zip",
-            "md5": ""
-        },
-        "trickystore": {
-            "url": "https://github.com/5ec1cff/TrickyStore/releases/download/1.3.0/TrickyStore-v1.3.0-release.zip",
-            "md5": ""
-        },
-        "tricky_addon": {
-            "url": "https://github.com/KOWX712/Tricky-Addon-Update-Target-List/releases/download/v4.1/Tricky-Addon-Update-Target-List-v4.1.zip",
-            "md5": ""
-        },
-        "ksu_webui": {
-            "url": "https://github.com/5ec1cff/KsuWebUIStandalone/releases/download/v1.0/KsuWebUIStandalone-v1.0.zip",
-            "md5": ""
-        }
-    }
 
-    dl_file_name = os.path.join(download_loc, "magisk_enhanced.apk")
-    modules_dir = os.path.join(download_loc, "modules")
-    act_md5 = ""  # Will be set dynamically
+    # Catalog components bundled as Magisk modules
+    modules = ("rezygisk", "playintegrity", "trickystore", "tricky_addon", "ksu_webui")
+
+    dl_file = "magisk_enhanced.apk"
     extract_to = "/tmp/magisk_enhanced_unpack"
     copy_dir = "./magisk_enhanced"
-    magisk_dir = os.path.join(copy_dir, "system", "etc", "init", "magisk")
-    modules_install_dir = os.path.join(copy_dir, "data", "adb", "modules")
-    machine = host()
 
     original_bootanim = """
 service bootanim /system/bin/bootanimation
@@ -78,7 +51,6 @@ on property:sys.boot_completed=1
     mkdir /data/adb/modules 755
     exec u:r:su:s0 root root -- {MAGISKTMP}/magisk --auto-selinux --boot-complete
     exec -- /system/bin/sh -c "if [ ! -e /data/data/com.topjohnwu.magisk ] ; then pm install /system/etc/init/magisk/magisk.apk ; fi"
-    exec -- /system/bin/sh -c "if [ -d /data/adb/modules ] ; then /system/etc/init/magisk/install_modules.sh ; fi"
 
 on property:init.svc.zygote=restarting
     exec u:r:su:s0 root root -- {MAGISKTMP}/magisk --auto-selinux --zygote-restart
@@ -87,6 +59,12 @@ on property:init.svc.zygote=stopped
     exec u:r:su:s0 root root -- {MAGISKTMP}/magisk --auto-selinux --zygote-restart
     """.format(MAGISKSYSTEMDIR="/system/etc/init/magisk", MAGISKTMP="/sbin", magisk_name="magisk")
 
+    # Only needed when the modules are installed on the device
+    modules_boot_component = """
+on property:sys.boot_completed=1
+    exec -- /system/bin/sh -c "if [ -d /data/adb/modules ] ; then /system/etc/init/magisk/install_modules.sh ; fi"
+"""
+
     module_install_script = """#!/system/bin/sh
 # Magisk Enhanced Modules Auto-Installer
 
@@ -135,10 +113,39 @@ install_module "KsuWebUIStandalone"
 echo "All modules installation completed"
 """
 
-    def __init__(self):
+    def __init__(self, preinstall_modules=False):
         super().__init__()
-        self.dl_link = self.dl_links["magisk"]["url"]
-        self.act_md5 = self.dl_links["magisk"]["md5"]
+        self.machine = host()
+        # Expand the modules into data/adb/modules at build time instead of unzipping them on first boot
+        self.preinstall_modules = preinstall_modules
+        self.modules_dir = os.path.join(self.download_loc, "modules")
+        catalog = load_catalog()
+        self.use_artifact(catalog.lookup("magisk_enhanced"))
+        self.module_artifacts = {name: catalog.lookup(name) for name in self.modules}
+
+    @property
+    def magisk_dir(self):
+        return os.path.join(self.copy_dir, "system", "etc", "init", "magisk")
+
+    @property
+    def modules_install_dir(self):
+        return os.path.join(self.copy_dir, "data", "adb", "modules")
+
+    def module_file(self, module_name):
+        """Cached zip of a module, keyed by its URL like the other artifacts"""
+        url = self.module_artifacts[module_name].url
+        return os.path.join(self.modules_dir, "{}-{}.zip".format(module_name, hashlib.sha1(url.encode()).hexdigest()[:12]))
+
+    def cache_entries(self):
+        return super().cache_entries() + [
+            ("{}-{}".format(type(self).__name__.lower(), os.path.basename(self.module_file(name))[:-len(".zip")]),
+             artifact.url, self.module_file(name))
+            for name, artifact in self.module_artifacts.items()]
+
+    def layer_inputs(self):
+        return dict(super().layer_inputs(), arch=self.machine[0],
+                    modules={name: artifact.url for name, artifact in self.module_artifacts.items()},
+                    preinstall_modules=self.preinstall_modules)
 
     def download(self):
         print_color("Downloading Magisk Enhanced (v30.2) and modules .....", bcolors.GREEN)
@@ -151,11 +158,9 @@ echo "All modules installation completed"
         super().download()
 
         # Download all modules
-        for module_name, module_info in self.dl_links.items():
-            if module_name != "magisk":
-                module_file = os.path.join(self.modules_dir, f"{module_name}.zip")
-                print_color(f"Downloading {module_name}...", bcolors.GREEN)
-                download_file(module_info["url"], module_file)
+        for module_name, artifact in self.module_artifacts.items():
+            print_color(f"Downloading {module_name}...", bcolors.GREEN)
+            self.fetch(artifact.url, self.module_file(module_name), artifact.md5)
 
     def extract(self):
         print_color("Extracting Magisk APK...", bcolors.GREEN)
@@ -214,6 +219,7 @@ echo "All modules installation completed"
         }
 
         lib_dir = os.path.join(self.extract_to, "lib", arch_map[self.machine[0]])
+        chmods = []
         for parent, dirnames, filenames in os.walk(lib_dir):
             for filename in filenames:
                 o_path = os.path.join(lib_dir, filename)
@@ -221,27 +227,16 @@ echo "All modules installation completed"
                 if filename_match:
                     n_path = os.path.join(self.magisk_dir, filename_match.group(1))
                     shutil.copyfile(o_path, n_path)
-                    run(["chmod", "+x", n_path])
+                    chmods.append(run_async(["chmod", "+x", n_path]))
+        wait_all(chmods)
 
         # Copy Magisk APK
         shutil.copyfile(self.dl_file_name, os.path.join(self.magisk_dir, "magisk.apk"))
 
-        # Copy modules to magisk directory
-        modules_magisk_dir = os.path.join(self.magisk_dir, "modules")
-        if not os.path.exists(modules_magisk_dir):
-            os.makedirs(modules_magisk_dir)
-
-        for module_file in os.listdir(self.modules_dir):
-            if module_file.endswith('.zip'):
-                src_path = os.path.join(self.modules_dir, module_file)
-                dst_path = os.path.join(modules_magisk_dir, module_file)
-                shutil.copyfile(src_path, dst_path)
-
-        # Create module installation script
-        install_script_path = os.path.join(self.magisk_dir, "install_modules.sh")
-        with open(install_script_path, "w") as script_file:
-            script_file.write(self.module_install_script)
-        os.chmod(install_script_path, 0o755)
+        if self.preinstall_modules:
+            self.expand_modules()
+        else:
+            self.stage_module_zips()
 
         # Backup original bootanim.rc
         bootanim_path = os.path.join(self.copy_dir, "system", "etc", "init", "bootanim.rc")
@@ -250,12 +245,43 @@ echo "All modules installation completed"
         if not os.path.exists(os.path.dirname(bootanim_path)):
             os.makedirs(os.path.dirname(bootanim_path))
 
-        with gzip.open(gz_filename, 'wb') as f_gz:
+        with gzip.GzipFile(gz_filename, "wb", mtime=0) as f_gz:
             f_gz.write(self.original_bootanim.encode('utf-8'))
 
         with open(bootanim_path, "w") as initfile:
-            initfile.write(self.original_bootanim + self.bootanim_component)
+            initfile.write(self.original_bootanim + self.bootanim_component +
+                           ("" if self.preinstall_modules else self.modules_boot_component))
 
         os.chmod(bootanim_path, 0o644)
 
-        print_color("Magisk Enhanced with modules copied successfully", bcolors.GREEN)
\ No newline at end of file
+        print_color("Magisk Enhanced with modules copied successfully", bcolors.GREEN)
+
+    def stage_module_zips(self):
+        """Ship the module zips for install_modules.sh to unzip on first boot"""
+        modules_magisk_dir = os.path.join(self.magisk_dir, "modules")
+        if not os.path.exists(modules_magisk_dir):
+            os.makedirs(modules_magisk_dir)
+
+        for module_name in self.module_artifacts:
+            module_file = self.module_file(module_name)
+            with file_lock(module_file):
+                shutil.copyfile(module_file, os.path.join(modules_magisk_dir, f"{module_name}.zip"))
+
+        # Create module installation script
+        install_script_path = os.path.join(self.magisk_dir, "install_modules.sh")
+        with open(install_script_path, "w") as script_file:
+            script_file.write(self.module_install_script)
+        os.chmod(install_script_path, 0o755)
+
+    def expand_modules(self):
+        """Lay the modules out in data/adb/modules the way Magisk installs them"""
+        for module_name in self.module_artifacts:
+            module_file = self.module_file(module_name)
+            with file_lock(module_file), zipfile.ZipFile(module_file) as z:
+                module_id = module_name
+                if "module.prop" in z.namelist():
+                    for line in z.read("module.prop").decode("utf-8", "replace").splitlines():
+                        if line.startswith("id="):
+                            module_id = line[len("id="):].strip()
+                print_color(f"Pre-installing module {module_id} ...", bcolors.GREEN)
+                unzip_module(z, os.path.join(self.modules_install_dir, module_id))
@@ -0,0 +1,61 @@
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from stuff.catalog import load_catalog
+from stuff.general import General
+from tools.helper import bcolors, print_color, wait_all
+
+class MagiskModule(General):
+    """A standalone Magisk module, unzipped straight into the shared data/adb/modules staging tree"""
+    # Catalog name of the module and the directory Magisk knows it by
+    addon = None
+    module_id = None
+    copy_dir = "./modules"
+
+    def __init__(self):
+        super().__init__()
+        self.use_artifact(load_catalog().lookup(self.addon))
+
+    @property
+    def module_dir(self):
+        return os.path.join(self.copy_dir, "data", "adb", "modules", self.module_id)
+
+    def extract(self):
+        # copy() unzips the downloaded module in place
+        pass
+
+    def copy(self):
+        if os.path.exists(self.module_dir):
+            shutil.rmtree(self.module_dir)
+
+        print_color(f"Installing {self.module_id} module...", bcolors.GREEN)
+        with zipfile.ZipFile(self.dl_file_name) as z:
+            unzip_module(z, self.module_dir)
+
+def module_mode(info):
+    """Mode of an unzipped module entry: scripts, binaries and directories are executable"""
+    name = info.filename.rstrip("/")
+    if (info.is_dir() or name.endswith(".sh") or os.path.basename(os.path.dirname(name)) in ("bin", "xbin")
+            or (info.external_attr >> 16) & 0o111):
+        return 0o755
+    return 0o644
+
+def unzip_module(z, module_dir):
+    """Lay out an opened module zip in module_dir the way Magisk installs it"""
+    for info in z.infolist():
+        # The installer metadata is not part of an installed module
+        if info.filename.startswith("META-INF/"):
+            continue
+        # Modes are set as files are written, so no permission pass over the tree is needed
+        os.chmod(z.extract(info, module_dir), module_mode(info))
+
+    # Create enable file for auto-mounting
+    open(os.path.join(module_dir, "auto_mount"), "w").close()
+
+def install_modules(modules):
+    """Download and unzip modules concurrently into their one data/adb/modules tree"""
+    if modules and os.path.exists(modules[0].copy_dir):
+        shutil.rmtree(modules[0].copy_dir)
+    with ThreadPoolExecutor(max_workers=len(modules) or 1) as pool:
+        wait_all([pool.submit(module.install) for module in modules])
@@ -1,18 +1,18 @@
 import os
 import shutil
+from stuff.catalog import load_catalog
 from stuff.general import General
-from tools.helper import bcolors, get_download_dir, print_color, run
+from tools.helper import bcolors, print_color, run
 
 class Ndk(General):
-    download_loc = get_download_dir()
     copy_dir = "./ndk"
-    
-    # Using the original working NDK translation link for all architectures
-    # The original NDK translation works on ARM64 hosts as well as x86
-    dl_link = "https://github.com/supremegamers/vendor_google_proprietary_ndk_translation-prebuilt/archive/9324a8914b649b885dad6f2bfd14a67e5d1520bf.zip"
-    dl_file_name = os.path.join(download_loc, "libndktranslation.zip")
+    dl_file = "libndktranslation.zip"
     extract_to = "/tmp/libndkunpack"
-    act_md5 = "c9572672d1045594448068079b34c350"
+
+    def __init__(self):
+        super().__init__()
+        # The same NDK translation build works on ARM64 hosts as well as x86
+        self.use_artifact(load_catalog().lookup("ndk"))
     
     def download(self):
         print_color("Downloading libndk now .....", bcolors.GREEN)
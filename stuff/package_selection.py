@@ -0,0 +1,104 @@
+import os
+import shutil
+import struct
+from dataclasses import dataclass
+
+from tools.helper import bcolors, print_color
+
+# Density buckets used in OpenGapps package directory names such as 240-320-480
+DPI_NAMES = {"ldpi": 120, "mdpi": 160, "tvdpi": 213, "hdpi": 240, "xhdpi": 320, "xxhdpi": 480, "xxxhdpi": 640}
+
+# Directories holding one sub directory per app
+APP_DIRS = ("app", "priv-app")
+
+@dataclass(frozen=True)
+class PackageSelection:
+    """Which Gapps apps to install and which screen density to take them for
+
+    Names are matched case-insensitively against package and app directory
+    names. Without include every app is kept.
+    """
+    include: frozenset = frozenset()
+    exclude: frozenset = frozenset()
+    dpi: int = None
+
+    @classmethod
+    def create(cls, include=None, exclude=None, dpi=None):
+        if isinstance(dpi, str):
+            dpi = DPI_NAMES[dpi] if dpi in DPI_NAMES else int(dpi)
+        return cls(frozenset(n.lower() for n in include or ()), frozenset(n.lower() for n in exclude or ()), dpi)
+
+    def wants(self, *names):
+        names = {name.lower() for name in names}
+        if names & self.exclude:
+            return False
+        return not self.include or bool(names & self.include)
+
+    def skips_package(self, package, packages):
+        """Whether an OpenGapps package among packages can be left out without unpacking it
+
+        Include names that are no package name may be app directories inside
+        any package, so then only excluded packages are skipped.
+        """
+        package = package.lower()
+        if package in self.exclude:
+            return True
+        if not self.include or self.include - {p.lower() for p in packages}:
+            return False
+        return package not in self.include
+
+    def best_dpi(self, dirs):
+        """Pick the density directory of an OpenGapps package closest to dpi
+
+        An exact bucket wins, then the smallest one above dpi so assets are
+        scaled down rather than up, then the largest. Without dpi nodpi is
+        preferred since it fits every screen.
+        """
+        buckets = {}
+        for d in dirs:
+            if d != "nodpi" and all(part.isdigit() for part in d.split("-")):
+                buckets[d] = [int(part) for part in d.split("-")]
+        if self.dpi is None and "nodpi" in dirs or not buckets:
+            return "nodpi" if "nodpi" in dirs else sorted(dirs)[0]
+        if self.dpi is not None:
+            exact = [d for d, dpis in buckets.items() if self.dpi in dpis]
+            if exact:
+                return min(exact, key=lambda d: len(buckets[d]))
+            above = [d for d, dpis in buckets.items() if min(dpis) > self.dpi]
+            if above:
+                return min(above, key=lambda d: min(buckets[d]))
+        return max(buckets, key=lambda d: max(buckets[d]))
+
+    def as_dict(self):
+        return {"include": sorted(self.include), "exclude": sorted(self.exclude), "dpi": self.dpi}
+
+def tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(parent, name))
+               for parent, _, names in os.walk(path) for name in names
+               if not os.path.islink(os.path.join(parent, name)))
+
+def lzip_size(path):
+    """Uncompressed size recorded in the trailer of a single member lzip file"""
+    with open(path, "rb") as f:
+        f.seek(-16, os.SEEK_END)
+        return struct.unpack("<Q", f.read(8))[0]
+
+def copy_system(src, dst, selection):
+    """copytree src to dst leaving out unwanted app directories; returns the bytes left out"""
+    saved = []
+
+    def ignore(directory, names):
+        if os.path.basename(directory) not in APP_DIRS:
+            return []
+        skipped = [name for name in names if os.path.isdir(os.path.join(directory, name)) and not selection.wants(name)]
+        saved.extend(tree_size(os.path.join(directory, name)) for name in skipped)
+        return skipped
+
+    shutil.copytree(src, dst, ignore=ignore, dirs_exist_ok=True)
+    return sum(saved)
+
+def report_saved(component, saved):
+    if saved:
+        print_color("{} package selection left out {:.1f} MiB".format(component, saved / 1024 ** 2), bcolors.GREEN)
@@ -0,0 +1,25 @@
+import importlib
+
+# Addon name -> (module, class). Modules are only imported once an addon is
+# selected, so --help and argument errors do not pay for every component.
+COMPONENTS = {
+    "gapps": ("stuff.gapps", "Gapps"),
+    "litegapps": ("stuff.litegapps", "LiteGapps"),
+    "mindthegapps": ("stuff.mindthegapps", "MindTheGapps"),
+    "ndk": ("stuff.ndk", "Ndk"),
+    "houdini": ("stuff.houdini", "Houdini"),
+    "houdini_hack": ("stuff.houdini_hack", "Houdini_Hack"),
+    "magisk": ("stuff.magisk", "Magisk"),
+    "magisk_enhanced": ("stuff.magisk_enhanced", "MagiskEnhanced"),
+    "widevine": ("stuff.widevine", "Widevine"),
+    "rezygisk": ("stuff.rezygisk", "ReZygisk"),
+    "playintegrity": ("stuff.playintegrity", "PlayIntegrityFix"),
+    "trickystore": ("stuff.trickystore", "TrickyStore"),
+    "tricky_addon": ("stuff.tricky_addon", "TrickyAddon"),
+    "ksu_webui": ("stuff.ksu_webui", "KsuWebUIStandalone"),
+}
+
+def component(name):
+    """Import and return the component class registered as name"""
+    module, cls = COMPONENTS[name]
+    return getattr(importlib.import_module(module), cls)
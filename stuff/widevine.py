@@ -1,8 +1,9 @@
 import os
 import re
 import shutil
+from stuff.catalog import load_catalog
 from stuff.general import General
-from tools.helper import bcolors, get_download_dir, host, print_color, run
+from tools.helper import bcolors, host, print_color, run
 
 
 class Widevine(General):
@@ -11,44 +12,22 @@ class Widevine(General):
         self.android_version = android_version
         self.machine = host()
         
-        if self.machine[0] in self.dl_links and android_version in self.dl_links[self.machine[0]]:
-            self.dl_link = self.dl_links[self.machine[0]][android_version][0]
-            self.act_md5 = self.dl_links[self.machine[0]][android_version][1]
-        else:
+        artifact = load_catalog().lookup("widevine", android_version, self.machine[0])
+        if artifact is None:
             raise ValueError(f"No Widevine available for {self.machine[0]} on Android {android_version}")
+        self.use_artifact(artifact)
 
-    download_loc = get_download_dir()
     copy_dir = "./widevine"
     
-    # Using known working Widevine download links
-    dl_links = {
-        "x86_64": {
-            "11.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/48d1076a570837be6cdce8252d5d143363e37cc1.zip",
-                       "f587b8859f9071da4bca6cea1b9bed6a"],
-            "12.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/3bba8b6e9dd5ffad5b861310433f7e397e9366e8.zip",
-                       "3e147bdeeb7691db4513d93cfa6beb23"],
-            "13.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/a8524d608431573ef1c9313822d271f78728f9a6.zip",
-                       "5c55df61da5c012b4e43746547ab730f"],
-            # For Android 14, we'll use the Android 13 version as fallback
-            "14.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/a8524d608431573ef1c9313822d271f78728f9a6.zip",
-                       "5c55df61da5c012b4e43746547ab730f"]
-        },
-        "arm64": {
-            "11.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/a1a19361d36311bee042da8cf4ced798d2c76d98.zip",
-                       "fed6898b5cfd2a908cb134df97802554"],
-            # For other versions, we'll use the 11.0.0 version as it's the most stable for ARM64
-            "12.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/a1a19361d36311bee042da8cf4ced798d2c76d98.zip",
-                       "fed6898b5cfd2a908cb134df97802554"],
-            "13.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/a1a19361d36311bee042da8cf4ced798d2c76d98.zip",
-                       "fed6898b5cfd2a908cb134df97802554"],
-            "14.0.0": ["https://github.com/supremegamers/vendor_google_proprietary_widevine-prebuilt/archive/a1a19361d36311bee042da8cf4ced798d2c76d98.zip",
-                       "fed6898b5cfd2a908cb134df97802554"]
-        }
-    }
-    
-    dl_file_name = os.path.join(download_loc, "widevine.zip")
+    dl_file = "widevine.zip"
     extract_to = "/tmp/widevineunpack"
 
+    def layer_inputs(self):
+        # Only the Android 11 x86 build gets extra libprotobuf symlinks, every
+        # other version staging the same zip produces the same layer
+        return dict(super().layer_inputs(), arch=self.machine[0],
+                    protobuf_symlinks="x86" in self.machine[0] and self.android_version == "11.0.0")
+
     def download(self):
         print_color(f"Downloading widevine for {self.machine[0]} Android {self.android_version} now .....", bcolors.GREEN)
         super().download()
@@ -0,0 +1,95 @@
+import gzip
+import json
+
+import analyze_logs
+from analyze_logs import (ANALYSES, SHOWN, BuildSummary, DockerEvents, DownloadStats, ErrorPatterns, LogAnalyzer,
+                          ModuleStats, scan)
+from tools.log_index import RetentionPolicy, close_session, register_session
+
+def write_session(log_dir, session_id, entries=(), detailed="", errors=""):
+    register_session(str(log_dir), session_id, RetentionPolicy(compression="none"))
+    (log_dir / "detailed_{}.log".format(session_id)).write_text(detailed)
+    if errors:
+        (log_dir / "errors_{}.log".format(session_id)).write_text(errors)
+    (log_dir / "structured_{}.json".format(session_id)).write_text("".join(json.dumps(e) + "\n" for e in entries))
+    close_session(str(log_dir), session_id)
+
+def download(action, filename, level="INFO"):
+    return {"action": action, "filename": filename, "level": level, "message": action}
+
+def test_analyze_sessions_reads_the_index_once(tmp_path, monkeypatch):
+    for i in range(4):
+        write_session(tmp_path, "20260101_12000{}_1".format(i),
+                      [download("download_start", "gapps.zip"), download("download_complete", "gapps.zip")])
+    reads = []
+    load_index = analyze_logs.load_index
+    monkeypatch.setattr(analyze_logs, "load_index", lambda log_dir: reads.append(log_dir) or load_index(log_dir))
+
+    analyzer = LogAnalyzer(tmp_path)
+    stats, = analyzer.analyze_sessions(analyzer.sessions_since(), [DownloadStats], workers=2)
+
+    assert len(reads) == 2  # sessions_since, then resolving the files of all sessions
+    assert stats.counts == {"started": 4, "completed": 4}
+    assert stats.found == {"structured"}
+
+def test_scan_feeds_every_analysis_from_one_pass(tmp_path):
+    structured = tmp_path / "structured.json.gz"
+    with gzip.open(structured, "wt") as f:
+        f.write(json.dumps({"android_version": "13.0.0", "container_type": "docker"}) + "\n")
+        f.write("not json\n")
+        for entry in [download("download_start", "gapps.zip"), download("download_start", "ndk.zip"),
+                      download("download_complete", "gapps.zip"), download("download_error", "ndk.zip", "ERROR"),
+                      {"module_name": "rezygisk", "action": "start"}, {"module_name": "rezygisk", "action": "success"},
+                      {"module_name": "trickystore", "action": "error", "error": "bad zip"},
+                      {"action": "docker_build_complete", "image_name": "redroid:13", "build_time": 42.0}]:
+            f.write(json.dumps(entry) + "\n")
+    detailed = tmp_path / "detailed.log"
+    detailed.write_text("starting\nBUILD COMPLETED SUCCESSFULLY\n")
+    errors = tmp_path / "errors.log"
+    errors.write_text("t ERROR x - FileNotFoundError: gone\nt ERROR x - module=ndk CalledProcessError\nt WARNING y\n")
+
+    summary, patterns, downloads, modules, docker = consumers = [analysis() for analysis in ANALYSES]
+    scan({"detailed": detailed, "errors": errors, "structured": structured}, consumers)
+
+    assert summary.succeeded and summary.details == {"android_version": "13.0.0", "container_type": "docker"}
+    assert patterns.counts == {"File Not Found": 1, "Command Failures": 1}
+    assert patterns.module_errors == {"ndk": 1}
+    assert downloads.counts == {"started": 2, "completed": 1, "failed": 1}
+    assert downloads.started - downloads.completed == {"ndk.zip"}
+    assert modules.actions == {"rezygisk": {"start", "success"}, "trickystore": {"error"}}
+    assert list(modules.errors["trickystore"]) == ["bad zip"]
+    assert docker.seen == 1 and docker.events[0]["build_time"] == 42.0
+
+def test_missing_logs_are_reported(tmp_path, capsys):
+    consumers = [ErrorPatterns(), DockerEvents()]
+    scan({"errors": tmp_path / "missing.log"}, consumers)
+    for consumer in consumers:
+        consumer.render()
+    out = capsys.readouterr().out
+    assert "No error log file found" in out and "No structured log file found" in out
+
+def test_merge_keeps_lists_bounded():
+    totals = DownloadStats()
+    for i in range(3):
+        part = DownloadStats()
+        for j in range(SHOWN):
+            part.feed("structured", download("download_error", "{}-{}.zip".format(i, j), "ERROR"))
+        totals.merge(part)
+    assert totals.counts["failed"] == 3 * SHOWN
+    assert len(totals.failed) == SHOWN and totals.failed[-1][0] == "2-{}.zip".format(SHOWN - 1)
+
+def test_merged_build_summary(capsys):
+    first, second = BuildSummary(), BuildSummary()
+    first.feed("detailed", (1, "BUILD FAILED"))
+    first.found.add("detailed")
+    second.feed("structured", {"device_profile": "pixel"})
+    first.merge(second)
+    first.render()
+    out = capsys.readouterr().out
+    assert "Build Status: FAILED" in out and "Device Profile: pixel" in out
+
+def test_module_stats_ignore_unrelated_entries():
+    stats = ModuleStats()
+    stats.feed("structured", {"module_name": "rezygisk"})
+    stats.feed("structured", {"action": "start"})
+    assert stats.actions == {}
@@ -0,0 +1,46 @@
+import re
+
+from stuff.catalog import ANY, Artifact, Catalog, load_catalog
+
+ENTRIES = [
+    {"component": "gapps", "url": "https://example.com/gapps-any.zip"},
+    {"component": "gapps", "versions": ["11.0.0"], "arch": "x86_64", "url": "https://example.com/gapps-11-x86_64.zip",
+     "md5": "0" * 32},
+    {"component": "gapps", "versions": ["11.0.0"], "url": "https://example.com/gapps-11.zip"},
+    {"component": "gapps", "arch": "arm64", "url": "https://example.com/gapps-arm64.zip"},
+    {"component": "houdini", "versions": ["8.1.0", "9.0.0"], "arch": "x86_64", "url": "https://example.com/houdini.zip"},
+]
+
+def test_lookup_prefers_the_most_specific_entry():
+    catalog = Catalog(ENTRIES)
+    assert catalog.lookup("gapps", "11.0.0", "x86_64") == Artifact("gapps", "https://example.com/gapps-11-x86_64.zip", "0" * 32)
+    assert catalog.lookup("gapps", "11.0.0", "arm64").url == "https://example.com/gapps-11.zip"
+    assert catalog.lookup("gapps", "13.0.0", "arm64").url == "https://example.com/gapps-arm64.zip"
+    assert catalog.lookup("gapps", "13.0.0", "x86").url == "https://example.com/gapps-any.zip"
+    assert catalog.lookup("gapps").url == "https://example.com/gapps-any.zip"
+
+def test_lookup_misses():
+    catalog = Catalog(ENTRIES)
+    assert catalog.lookup("houdini", "11.0.0", "x86_64") is None
+    assert catalog.lookup("houdini", "9.0.0", "x86") is None
+    assert catalog.lookup("widevine") is None
+
+def test_query_matches_wildcards():
+    catalog = Catalog(ENTRIES)
+    assert sorted(key for key, _ in catalog.query("gapps", version="13.0.0")) == [
+        ("gapps", ANY, ANY), ("gapps", ANY, "arm64")]
+    assert sorted(key for key, _ in catalog.query(arch="x86_64", version="9.0.0")) == [
+        ("gapps", ANY, ANY), ("houdini", "9.0.0", "x86_64")]
+
+def test_artifacts_are_distinct():
+    urls = [artifact.url for artifact in Catalog(ENTRIES).artifacts()]
+    assert sorted(urls) == sorted({entry["url"] for entry in ENTRIES})
+
+def test_shipped_catalog_is_valid():
+    catalog = load_catalog()
+    assert catalog.entries
+    for entry in catalog.entries:
+        assert entry["url"].startswith("https://")
+        assert entry.get("md5") is None or re.fullmatch(r"[0-9a-f]{32}", entry["md5"])
+    for component in ("magisk_enhanced", "rezygisk", "playintegrity", "trickystore", "tricky_addon", "ksu_webui"):
+        assert catalog.lookup(component) is not None
@@ -0,0 +1,51 @@
+from stuff.catalog import Catalog
+from stuff.compat import CompatMatrix, addon_components, load_matrix
+
+CATALOG = Catalog([
+    {"component": "ndk", "url": "https://example.com/ndk.zip"},
+    {"component": "houdini", "versions": ["8.1.0", "13.0.0"], "url": "https://example.com/houdini.zip"},
+    {"component": "houdini_hack", "versions": ["13.0.0"], "url": "https://example.com/houdini_hack.zip"},
+    {"component": "widevine", "versions": ["13.0.0"], "arch": "x86_64", "url": "https://example.com/widevine.zip"},
+])
+ADDONS = ("ndk", "houdini", "widevine")
+
+def test_constraints():
+    matrix = CompatMatrix(CATALOG, ADDONS)
+    assert matrix.reason("ndk", "13.0.0", "x86_64") is None
+    assert matrix.reason("ndk", "10.0.0", "x86_64") == "ndk needs Android 11.0.0 or newer"
+    assert matrix.reason("ndk", "13.0.0", "arm") == "ndk only works on x86/x86_64/arm64 hosts"
+    assert matrix.reason("houdini", "13.0.0", "arm64") == "houdini only works on x86/x86_64 hosts"
+
+def test_missing_catalog_builds_list_what_is_available():
+    matrix = CompatMatrix(CATALOG, ADDONS)
+    assert matrix.reason("widevine", "13.0.0", "x86_64") is None
+    assert matrix.reason("widevine", "12.0.0", "x86_64") == "no widevine build for x86_64 on Android 12.0.0 (available: 13.0.0)"
+    assert matrix.reason("widevine", "13.0.0", "x86") == "no widevine build for x86 on Android 13.0.0 (available: none)"
+
+def test_houdini_needs_the_hack_after_8_1():
+    assert addon_components("houdini", "8.1.0") == ["houdini"]
+    assert addon_components("houdini", "13.0.0") == ["houdini", "houdini_hack"]
+    matrix = CompatMatrix(CATALOG, ADDONS)
+    assert matrix.reason("houdini", "8.1.0", "x86_64") is None
+    assert matrix.reason("houdini", "13.0.0", "x86_64") is None
+    assert matrix.reason("houdini", "9.0.0", "x86_64").startswith("no houdini build for x86_64 on Android 9.0.0")
+
+def test_base_images_and_unknown_names():
+    matrix = CompatMatrix(CATALOG, ADDONS)
+    assert matrix.base_reason("15.0.0", "arm") == "there is no redroid:15.0.0 image for arm"
+    assert matrix.base_reason("7.0.0", "x86_64") == "unknown Android version 7.0.0"
+    assert matrix.reason("ndk", "15.0.0", "arm") == "there is no redroid:15.0.0 image for arm"
+    assert matrix.reason("gapps", "13.0.0", "x86_64") == "unknown addon gapps or Android version 13.0.0"
+
+def test_validate_reports_every_rejection():
+    matrix = CompatMatrix(CATALOG, ADDONS)
+    builds = [("13.0.0", {"ndk", "widevine"}), ("10.0.0", {"ndk"}), ("8.1.0", {"houdini"}), ("13.0.0_64only", {"ndk"})]
+    assert matrix.validate(builds, "x86_64") == [
+        ("10.0.0", "ndk", "ndk needs Android 11.0.0 or newer"),
+        ("13.0.0_64only", None, "there is no redroid:13.0.0_64only image for x86_64"),
+    ]
+
+def test_shipped_catalog_supports_x86_64_addons():
+    matrix = load_matrix(ADDONS)
+    assert matrix.reason("ndk", "13.0.0", "x86_64") is None
+    assert matrix.reason("houdini", "13.0.0", "x86_64") is None
@@ -0,0 +1,124 @@
+import io
+import json
+import socket
+import socketserver
+import subprocess
+import tarfile
+import threading
+import urllib.parse
+
+import pytest
+
+from tools import engine
+
+class EngineHandler(socketserver.StreamRequestHandler):
+    """Answers one POST /build, decoding the chunked tar context it uploads"""
+
+    def handle(self):
+        method, target, _ = self.rfile.readline().decode().split(" ", 2)
+        headers = {}
+        for line in iter(self.rfile.readline, b"\r\n"):
+            name, value = line.decode().split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        body = b""
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+                if size == 0:
+                    break
+        self.server.requests.append((method, target, headers, body))
+
+        status, lines = self.server.reply
+        payload = "".join(json.dumps(line) + "\r\n" for line in lines).encode()
+        self.wfile.write("HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+                         .format(status, len(payload)).encode() + payload)
+
+@pytest.fixture
+def engine_server(tmp_path, monkeypatch):
+    path = str(tmp_path / "docker.sock")
+    server = socketserver.ThreadingUnixStreamServer(path, EngineHandler)
+    server.requests = []
+    server.reply = ("200 OK", [])
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    monkeypatch.setenv("DOCKER_HOST", "unix://" + path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def context(tmp_path):
+    root = tmp_path / "context"
+    (root / "gapps" / "system").mkdir(parents=True)
+    (root / "Dockerfile").write_text("FROM redroid/redroid:13.0.0-latest\nCOPY gapps /\n")
+    (root / "gapps" / "system" / "build.prop").write_text("ro.test=1\n")
+    (root / "extract.zip").write_text("not part of the context")
+    return root
+
+def test_build_uploads_the_context_and_parses_events(engine_server, context):
+    engine_server.reply = ("200 OK", [
+        {"stream": "Step 1/2 : FROM redroid/redroid:13.0.0-latest\n"},
+        {"stream": " ---> 1234\n"},
+        {"stream": "Step 2/2 : COPY gapps /\n"},
+        {"status": "Downloading"},
+        {"aux": {"ID": "sha256:abcd"}},
+    ])
+
+    events = engine.build("docker", str(context), ["gapps"], "redroid/redroid:13.0.0_gapps")
+
+    assert [(event.kind, event.text.strip()) for event in events] == [
+        ("step", "Step 1/2 : FROM redroid/redroid:13.0.0-latest"), ("output", "---> 1234"),
+        ("step", "Step 2/2 : COPY gapps /"), ("status", "Downloading"), ("image", "sha256:abcd")]
+    (method, target, headers, body), = engine_server.requests
+    assert method == "POST" and headers["content-type"] == "application/x-tar"
+    assert urllib.parse.parse_qs(urllib.parse.urlsplit(target).query)["t"] == ["redroid/redroid:13.0.0_gapps"]
+    with tarfile.open(fileobj=io.BytesIO(body)) as tar:
+        assert tar.getnames() == ["Dockerfile", "gapps", "gapps/system", "gapps/system/build.prop"]
+        assert tar.extractfile("gapps/system/build.prop").read() == b"ro.test=1\n"
+    assert [step for step, _, _ in engine.step_timings(events, events[-1].time)] == [
+        "Step 1/2 : FROM redroid/redroid:13.0.0-latest", "Step 2/2 : COPY gapps /"]
+
+def test_error_event_fails_the_build(engine_server, context):
+    engine_server.reply = ("200 OK", [
+        {"stream": "Step 1/2 : FROM redroid/redroid:13.0.0-latest\n"},
+        {"errorDetail": {"message": "COPY failed"}, "error": "COPY failed: no such file"},
+    ])
+
+    with pytest.raises(engine.BuildError, match="COPY failed: no such file"):
+        engine.build("docker", str(context), ["gapps"], "redroid/redroid:13.0.0_gapps")
+
+def test_http_error_fails_the_build(engine_server, context):
+    engine_server.reply = ("500 Internal Server Error", [{"message": "engine is broken"}])
+
+    with pytest.raises(engine.BuildError, match="HTTP 500 .*engine is broken"):
+        engine.build("docker", str(context), ["gapps"], "redroid/redroid:13.0.0_gapps")
+
+@pytest.fixture
+def cli_runs(monkeypatch):
+    runs = []
+    monkeypatch.setattr(engine.subprocess, "run", lambda args: runs.append(args) or subprocess.CompletedProcess(args, 0))
+    return runs
+
+def test_missing_socket_falls_back_to_the_cli(tmp_path, monkeypatch, context, cli_runs):
+    monkeypatch.setenv("DOCKER_HOST", "unix://" + str(tmp_path / "missing.sock"))
+
+    assert engine.build("docker", str(context), ["gapps"], "redroid/redroid:13.0.0_gapps") == []
+    assert cli_runs == [["docker", "build", "-t", "redroid/redroid:13.0.0_gapps", str(context)]]
+
+def test_dead_socket_falls_back_to_the_cli(tmp_path, monkeypatch, context, cli_runs):
+    path = str(tmp_path / "dead.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+    monkeypatch.setenv("CONTAINER_HOST", "unix://" + path)
+
+    engine.build("podman", str(context), ["gapps"], "redroid/redroid:13.0.0_gapps")
+    assert cli_runs == [["podman", "build", "-t", "redroid/redroid:13.0.0_gapps", str(context)]]
+
+def test_failing_cli_raises(tmp_path, monkeypatch, context):
+    monkeypatch.setenv("DOCKER_HOST", "tcp://127.0.0.1:2375")
+    monkeypatch.setattr(engine.subprocess, "run", lambda args: subprocess.CompletedProcess(args, 1))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        engine.build("docker", str(context), ["gapps"], "redroid/redroid:13.0.0_gapps")
@@ -0,0 +1,65 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from tools import helper
+
+def python(code, *args):
+    return [sys.executable, "-c", code] + list(args)
+
+def test_stream_passes_every_line_and_keeps_the_tail():
+    lines = []
+    result = helper.stream(python("import sys\nfor i in range(100): print(i)\nprint('err', file=sys.stderr)"),
+                           lines.append, tail=3)
+    assert lines == [str(i) for i in range(100)] + ["err"]
+    assert result.returncode == 0 and result.stdout == "98\n99\nerr"
+
+def test_failing_command_raises_with_its_output():
+    with pytest.raises(subprocess.CalledProcessError) as failure:
+        helper.stream(python("import sys\nprint('working')\nsys.exit('tar: Error is not recoverable')"))
+    assert failure.value.returncode == 1
+    assert failure.value.output == "working\ntar: Error is not recoverable"
+
+def test_run_prints_the_output_of_a_failure(capsys):
+    with pytest.raises(subprocess.CalledProcessError):
+        helper.run(python("import sys\nsys.exit('broken')"))
+    assert capsys.readouterr().out == "broken\n"
+
+@pytest.fixture
+def two_commands(monkeypatch):
+    monkeypatch.setenv("REDROID_MAX_COMMANDS", "2")
+    helper.command_pool.cache_clear()
+    yield
+    helper.command_pool().shutdown()
+    helper.command_pool.cache_clear()
+
+RUNNING = """
+import os, sys, time
+path = os.path.join(sys.argv[1], str(os.getpid()))
+open(path, "w").close()
+print(len(os.listdir(sys.argv[1])))
+time.sleep(0.2)
+os.remove(path)
+"""
+
+def test_run_async_is_bounded_by_the_pool(tmp_path, two_commands):
+    start = time.monotonic()
+    futures = [helper.run_async(python(RUNNING, str(tmp_path))) for _ in range(6)]
+    helper.wait_all(futures)
+
+    running = [int(future.result().stdout) for future in futures]
+    assert max(running) <= 2
+    # Six 0.2s commands two at a time take three rounds
+    assert time.monotonic() - start >= 0.6
+
+def test_wait_all_waits_for_everything_then_raises_the_first_failure(tmp_path, two_commands):
+    done = tmp_path / "done"
+    futures = [helper.run_async(python("import sys\nsys.exit(3)")),
+               helper.run_async(python("import sys, time\ntime.sleep(0.3)\nopen(sys.argv[1], 'w').close()", str(done))),
+               helper.run_async(python("import sys\nsys.exit(4)"))]
+    with pytest.raises(subprocess.CalledProcessError) as failure:
+        helper.wait_all(futures)
+    assert failure.value.returncode == 3
+    assert done.exists()
@@ -0,0 +1,63 @@
+import os
+
+from stuff.magisk_enhanced import MagiskEnhanced
+from stuff.ndk import Ndk
+from tools.layers import cached_layer, layer_key, store_layers, use_cached_layers, write_layer
+from tools.workspace import Workspace
+
+class Component:
+    def __init__(self, copy_dir=None, **inputs):
+        self.copy_dir = copy_dir
+        self.inputs = dict({"component": "Fake", "url": "https://example.com/a.zip", "md5": None}, **inputs)
+
+    def layer_inputs(self):
+        return self.inputs
+
+def test_layer_key_depends_on_inputs_and_epoch(monkeypatch):
+    key = layer_key([Component()])
+    assert layer_key([Component()]) == key
+    assert layer_key([Component(url="https://example.com/b.zip")]) != key
+    assert layer_key([Component()], epoch=1) != key
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1")
+    assert layer_key([Component()]) == layer_key([Component()], epoch=1)
+
+def test_layer_key_depends_on_component_order():
+    first, second = Component(component="A"), Component(component="B")
+    assert layer_key([first, second]) != layer_key([second, first])
+
+def test_layer_key_of_real_components():
+    assert layer_key([Ndk()]) == layer_key([Ndk()])
+    assert layer_key([MagiskEnhanced()]) != layer_key([MagiskEnhanced(preinstall_modules=True)])
+
+def make_tree(root, mode=0o600):
+    os.makedirs(os.path.join(root, "system", "bin"))
+    for path in ("system/bin/tool", "system/build.prop"):
+        with open(os.path.join(root, path), "w") as f:
+            f.write(path)
+    os.chmod(os.path.join(root, "system", "bin", "tool"), 0o700)
+    os.chmod(os.path.join(root, "system", "build.prop"), mode)
+
+def test_write_layer_is_reproducible(tmp_path):
+    make_tree(str(tmp_path / "a"), 0o600)
+    make_tree(str(tmp_path / "b"), 0o664)
+    os.utime(tmp_path / "b" / "system" / "build.prop", (12345, 12345))
+
+    write_layer(str(tmp_path / "a"), str(tmp_path / "a.tar"))
+    write_layer(str(tmp_path / "b"), str(tmp_path / "b.tar"))
+
+    assert (tmp_path / "a.tar").read_bytes() == (tmp_path / "b.tar").read_bytes()
+
+def test_stored_layers_are_reused(tmp_path):
+    workspace = Workspace(str(tmp_path / "job1"))
+    component = Component(copy_dir=workspace.path("ndk"))
+    make_tree(component.copy_dir)
+    selected = [("ndk", [component])]
+    assert cached_layer([component]) is None
+
+    store_layers(selected, workspace, {"ndk"})
+
+    assert cached_layer([component]) is not None
+    other = Workspace(str(tmp_path / "job2"))
+    assert use_cached_layers(selected, other) == {"ndk"}
+    assert os.path.isfile(other.path("ndk.tar"))
+    assert use_cached_layers([("ndk", [Component(md5="0" * 32)])], other) == set()
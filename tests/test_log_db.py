@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from tools import log_db
+from tools.log_index import RetentionPolicy, close_session, register_session
+
+def write_session(log_dir, session_id, entries, closed=True):
+    register_session(str(log_dir), session_id, RetentionPolicy(compression="gzip"))
+    (log_dir / "structured_{}.json".format(session_id)).write_text(
+        "".join(json.dumps(entry) + "\n" for entry in entries) + "truncated {\n")
+    if closed:
+        close_session(str(log_dir), session_id)
+
+def event(time, level="INFO", **fields):
+    return dict({"timestamp": "2026-01-01T{}".format(time), "level": level, "message": fields.get("action", "")}, **fields)
+
+@pytest.fixture
+def log_dir(tmp_path):
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    return log_dir
+
+@pytest.fixture
+def db(tmp_path, log_dir):
+    write_session(log_dir, "20260101_100000_1", [
+        event("10:00:00", action="download_start", filename="/cache/gapps-11.zip"),
+        event("10:00:05", "ERROR", action="download_error", filename="/cache/gapps-11.zip"),
+        event("10:01:00", action="docker_build_complete", image_name="redroid:13_gapps", build_time=30.0),
+    ])
+    write_session(log_dir, "20260101_110000_1", [
+        event("11:00:00", "ERROR", action="error", module_name="rezygisk", error="bad zip"),
+        event("11:01:00", action="docker_build_complete", image_name="redroid:13_gapps", build_time=10.0),
+        event("11:02:00", action="docker_build_complete", image_name="redroid:13_gapps", build_time=20.0),
+    ])
+    db = log_db.connect(str(tmp_path / log_db.DB_FILE))
+    assert log_db.ingest(db, str(log_dir)) == {"20260101_100000_1": 3, "20260101_110000_1": 3}
+    return db
+
+def test_ingest_loads_closed_sessions_once(db, log_dir):
+    write_session(log_dir, "20260101_120000_1", [event("12:00:00", action="download_start")], closed=False)
+
+    assert log_db.ingest(db, str(log_dir)) == {"20260101_120000_1": 1}
+    assert log_db.ingest(db, str(log_dir)) == {"20260101_120000_1": 1}
+    assert db.execute("SELECT COUNT(*) FROM events").fetchone() == (7,)
+
+def test_ingest_reads_compressed_sessions(db, log_dir):
+    # Registering another session compresses the closed ones before it
+    write_session(log_dir, "20260101_120000_1", [])
+    assert sorted(p.name for p in log_dir.glob("*.gz")) == [
+        "structured_20260101_100000_1.json.gz", "structured_20260101_110000_1.json.gz"]
+    db.execute("DELETE FROM sessions")
+
+    assert log_db.ingest(db, str(log_dir)) == {"20260101_100000_1": 3, "20260101_110000_1": 3, "20260101_120000_1": 0}
+    assert db.execute("SELECT COUNT(*) FROM events").fetchone() == (6,)
+
+def test_queries(db):
+    columns, rows = log_db.failed_downloads(db)
+    assert rows == [("2026-01-01T10:00:05", "20260101_100000_1", "gapps", "download_error")]
+    assert log_db.errors(db, module="rezygisk")[1] == [("2026-01-01T11:00:00", "20260101_110000_1", "rezygisk", "error")]
+    assert log_db.build_times(db)[1] == [("redroid:13_gapps", 3, 20.0, 30.0, 30.0)]
+    assert log_db.sessions(db)[1] == [("20260101_100000_1", 3, 1, 0, 1), ("20260101_110000_1", 3, 1, 0, 2)]
+    assert log_db.errors(db, since="2026-01-01T10:30:00")[1] == [
+        ("2026-01-01T11:00:00", "20260101_110000_1", "rezygisk", "error")]
+
+def test_extra_fields_are_kept(db):
+    columns, rows = log_db.sql(db, "SELECT fields FROM events WHERE module = 'rezygisk'")
+    assert columns == ["fields"] and json.loads(rows[0][0]) == {"error": "bad zip"}
+
+def test_helpers():
+    assert log_db.module_of({"module_name": "rezygisk", "filename": "x.zip"}) == "rezygisk"
+    assert log_db.module_of({"filename": "/cache/MindTheGapps-13.zip"}) == "mindthegapps"
+    assert log_db.module_of({}) is None
+    assert log_db.percentile([1, 2, 3, 4], 50) == 2
+    assert log_db.percentile([1, 2, 3, 4], 95) == 4
+    assert log_db.parse_since("2026-01-01") == "2026-01-01T00:00:00"
+    with pytest.raises(ValueError):
+        log_db.parse_since("yesterday")
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from tools.log_index import INDEX_FILE, RetentionPolicy, close_session, expired, load_index, register_session, scan_sessions
+
+def touch(path, data="x"):
+    with open(path, "w") as f:
+        f.write(data)
+
+def test_scan_sessions_reads_old_and_pid_suffixed_ids(tmp_path):
+    touch(tmp_path / "detailed_20260101_120000.log")
+    touch(tmp_path / "structured_20260101_120000_4242.json.gz")
+    touch(tmp_path / "errors_20260101_120000_4243.log")
+    touch(tmp_path / "latest_detailed.log")
+
+    sessions = scan_sessions(str(tmp_path))
+
+    assert sorted(sessions) == ["20260101_120000", "20260101_120000_4242", "20260101_120000_4243"]
+    assert sessions["20260101_120000_4242"]["files"] == {"structured": "structured_20260101_120000_4242.json.gz"}
+    assert sessions["20260101_120000"]["started"] == sessions["20260101_120000_4242"]["started"]
+
+def test_register_session_refuses_an_existing_id(tmp_path):
+    policy = RetentionPolicy(compression="none")
+    register_session(str(tmp_path), "20260101_120000_1", policy)
+    register_session(str(tmp_path), "20260101_120000_2", policy)
+
+    with pytest.raises(FileExistsError):
+        register_session(str(tmp_path), "20260101_120000_1", policy)
+    assert sorted(load_index(str(tmp_path))) == ["20260101_120000_1", "20260101_120000_2"]
+
+def test_closed_sessions_are_compressed_and_expired(tmp_path):
+    log_dir = str(tmp_path)
+    policy = RetentionPolicy(max_sessions=1, max_age_days=None, compression="gzip")
+    for session_id in ("20260101_120000_1", "20260101_120001_1"):
+        register_session(log_dir, session_id, policy)
+        touch(tmp_path / "detailed_{}.log".format(session_id))
+        close_session(log_dir, session_id)
+
+    register_session(log_dir, "20260101_120002_1", policy)
+
+    sessions = load_index(log_dir)
+    assert sorted(sessions) == ["20260101_120001_1", "20260101_120002_1"]
+    assert sessions["20260101_120001_1"]["files"] == {"detailed": "detailed_20260101_120001_1.log.gz"}
+    assert sorted(os.listdir(log_dir)) == [".sessions.lock", "detailed_20260101_120001_1.log.gz", INDEX_FILE]
+
+def test_expired_keeps_running_sessions():
+    sessions = {
+        "20260101_120000_1": {"closed": True, "bytes": 10, "started": 0},
+        "20260101_120001_1": {"closed": False, "bytes": 10, "started": 0},
+    }
+    policy = RetentionPolicy(max_sessions=None, max_bytes=None, max_age_days=1)
+    assert expired(sessions, policy, now=10 * 86400) == ["20260101_120000_1"]
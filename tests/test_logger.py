@@ -0,0 +1,56 @@
+import json
+import logging
+from datetime import datetime
+
+import tools.logger as logger_module
+from tools.logger import EnhancedLogger, JsonFormatter
+
+def test_issue_report_without_file_logging(tmp_path):
+    logger = EnhancedLogger("test_issue_report", log_dir=tmp_path / "logs", file_logging=False)
+
+    report_file = logger.create_issue_report({"step": "build"})
+
+    assert [p.name for p in (tmp_path / "logs").iterdir()] == [report_file.name]
+    with open(report_file) as f:
+        assert json.load(f)["error_context"] == {"step": "build"}
+
+def test_log_files_are_created_lazily(tmp_path):
+    logger = EnhancedLogger("test_lazy", log_dir=tmp_path / "logs", file_logging=True)
+    assert not (tmp_path / "logs").exists()
+
+    logger.info("first record")
+    logger.close()
+
+    with open(tmp_path / "logs" / "structured_{}.json".format(logger.session_id)) as f:
+        messages = [json.loads(line)["message"] for line in f]
+    assert messages[-1] == "first record"
+
+def record(created):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "message", None, None)
+    record.created = created
+    return record
+
+def test_json_timestamps_match_isoformat_across_seconds():
+    formatter = JsonFormatter()
+    base = 1767225599.0  # 23:59:59 UTC on 2025-12-31, the next second starts a new day
+    created = [base, base + 0.5, base + 0.999999, base + 0.9999996, base + 1, base + 1.000001, base + 1.25]
+    created += [base + i / 997 for i in range(3000)]
+    for value in created:
+        expected = datetime.fromtimestamp(value).isoformat()
+        assert json.loads(formatter.format(record(value)))["timestamp"] == expected, value
+
+def test_json_timestamps_format_each_second_once(monkeypatch):
+    formatter = JsonFormatter()
+    calls = []
+    real = logger_module.datetime
+
+    class CountingDatetime(real):
+        @classmethod
+        def fromtimestamp(cls, *args):
+            calls.append(args)
+            return real.fromtimestamp(*args)
+
+    monkeypatch.setattr(logger_module, "datetime", CountingDatetime)
+    for i in range(1000):
+        formatter.format(record(1767225599 + i / 500))
+    assert len(calls) == 2
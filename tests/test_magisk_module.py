@@ -0,0 +1,66 @@
+import os
+import stat
+import zipfile
+
+import redroid
+from stuff.magisk_module import install_modules, module_mode
+from tools import engine
+from tools.workspace import Workspace
+
+def entry(name, mode=0o644):
+    info = zipfile.ZipInfo(name)
+    info.external_attr = (mode | (stat.S_IFDIR if name.endswith("/") else stat.S_IFREG)) << 16
+    return info
+
+def write_module(path, entries):
+    with zipfile.ZipFile(path, "w") as z:
+        for info in entries:
+            z.writestr(info, "" if info.is_dir() else info.filename)
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_module_mode():
+    assert module_mode(entry("system/")) == 0o755
+    assert module_mode(entry("service.sh")) == 0o755
+    assert module_mode(entry("system/bin/tool")) == 0o755
+    assert module_mode(entry("zygisk/arm64-v8a.so", 0o755)) == 0o755
+    assert module_mode(entry("module.prop", 0o600)) == 0o644
+    assert module_mode(entry("bin.txt")) == 0o644
+
+def test_modules_are_staged_as_one_addon(tmp_path, monkeypatch):
+    workspace = Workspace(str(tmp_path / "job"))
+    selected = redroid.select_components("13.0.0", ["rezygisk", "trickystore"])
+    assert [(name, [type(c).__name__ for c in components]) for name, components in selected] == [
+        ("modules", ["ReZygisk", "TrickyStore"])]
+    rezygisk, trickystore = selected[0][1]
+    for component in (rezygisk, trickystore):
+        component.use_workspace(workspace)
+    # Cached downloads, the catalog pins no md5 for the modules
+    write_module(rezygisk.dl_file_name, [entry("module.prop"), entry("post-fs-data.sh"), entry("zygisk/"),
+                                         entry("zygisk/x86_64.so", 0o755), entry("META-INF/com/google/android/update-binary")])
+    write_module(trickystore.dl_file_name, [entry("module.prop", 0o600), entry("system/bin/keybox"), entry("daemon", 0o700)])
+
+    install_modules([rezygisk, trickystore])
+
+    modules = os.path.join(workspace.path("modules"), "data", "adb", "modules")
+    staged = {os.path.relpath(os.path.join(parent, name), modules): mode(os.path.join(parent, name))
+              for parent, dirs, files in os.walk(modules) for name in dirs + files}
+    assert staged == {
+        "ReZygisk": 0o755, "ReZygisk/module.prop": 0o644, "ReZygisk/post-fs-data.sh": 0o755,
+        "ReZygisk/zygisk": 0o755, "ReZygisk/zygisk/x86_64.so": 0o755, "ReZygisk/auto_mount": 0o644,
+        "TrickyStore": 0o755, "TrickyStore/module.prop": 0o644, "TrickyStore/system": 0o755,
+        "TrickyStore/system/bin": 0o755, "TrickyStore/system/bin/keybox": 0o755, "TrickyStore/daemon": 0o755,
+        "TrickyStore/auto_mount": 0o644,
+    }
+
+    builds = []
+    monkeypatch.setattr(engine, "build", lambda *args: builds.append(args))
+    tag = redroid.build_image("13.0.0", selected, "docker", workspace)
+
+    assert tag == "redroid/redroid:13.0.0_rezygisk_trickystore"
+    assert builds == [("docker", workspace.root, ["modules"], tag)]
+    with open(workspace.dockerfile) as f:
+        assert f.read() == "FROM redroid/redroid:13.0.0-latest\nCOPY modules /\n"
+    with open(workspace.path(".dockerignore")) as f:
+        assert f.read() == "*\n!modules\n"
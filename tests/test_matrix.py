@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+
+import pytest
+
+from tools import matrix
+from tools.matrix import MatrixJob
+
+def test_expand_spec():
+    spec = {"android": ["13.0.0", "14.0.0"],
+            "addons": [["litegapps", ["mindthegapps", "ndk"], None], ["magisk", None]]}
+    assert matrix.expand_spec(spec) == [
+        (android, frozenset(addons)) for android in ("13.0.0", "14.0.0") for addons in (
+            {"litegapps", "magisk"}, {"litegapps"}, {"mindthegapps", "ndk", "magisk"}, {"mindthegapps", "ndk"},
+            {"magisk"}, set())]
+
+def test_expand_spec_drops_duplicates():
+    spec = {"android": ["13.0.0"], "addons": [["ndk", None], ["ndk", None]]}
+    assert matrix.expand_spec(spec) == [("13.0.0", frozenset({"ndk"})), ("13.0.0", frozenset())]
+    assert matrix.expand_spec({"android": ["13.0.0"]}) == [("13.0.0", frozenset())]
+
+def test_load_spec_needs_android_versions(tmp_path):
+    path = tmp_path / "matrix.json"
+    path.write_text(json.dumps({"addons": [["ndk"]]}))
+    with pytest.raises(ValueError, match="does not list any android version"):
+        matrix.load_spec(str(path))
+
+class Component:
+    """Records its phases; components with the same key share one artifact"""
+
+    def __init__(self, key, log, fail=None):
+        self.key = key
+        self.log = log
+        self.fail = fail
+
+    def artifact_key(self):
+        return self.key
+
+    def run_phase(self, phase):
+        self.log.append((phase, self.key))
+        if phase == self.fail:
+            raise OSError("{} of {} failed".format(phase, self.key))
+        if phase == "copy":
+            with self.log.lock:
+                self.log.copying[self.key] = self.log.copying.get(self.key, 0) + 1
+                self.log.overlap = max(self.log.overlap, self.log.copying[self.key])
+            time.sleep(0.05)
+            with self.log.lock:
+                self.log.copying[self.key] -= 1
+
+class Log(list):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.copying = {}
+        self.overlap = 0
+
+def job(name, *components):
+    return MatrixJob(name, "13.0.0", [(name, list(components))], workspace=None)
+
+def test_run_matrix_prepares_shared_artifacts_once_and_collects_failures(capsys):
+    log = Log()
+    jobs = [job("a", Component("ndk", log), Component("gapps-13", log)),
+            job("b", Component("ndk", log)),
+            job("c", Component("ndk", log), Component("widevine", log)),
+            job("d", Component("broken", log, fail="copy"))]
+    built = []
+
+    def build(job):
+        # Every component of the job is staged before it is built
+        assert all(("copy", c.key) in log for c in job.components)
+        if job.name == "c":
+            raise RuntimeError("docker build failed")
+        built.append(job.name)
+
+    failures = matrix.run_matrix(jobs, build, workers=4)
+
+    for key in ("ndk", "gapps-13", "widevine", "broken"):
+        assert log.count(("download", key)) == log.count(("extract", key)) == 1
+    assert log.count(("copy", "ndk")) == 3
+    assert log.overlap == 1  # copies out of one extracted artifact never overlap
+    assert sorted(built) == ["a", "b"]
+    assert sorted((failed.name, str(e)) for failed, e in failures) == [
+        ("c", "docker build failed"), ("d", "copy of broken failed")]
+    out = capsys.readouterr().out
+    assert "Matrix job c failed: docker build failed" in out and "Matrix job a finished" in out
+
+def test_run_matrix_stops_when_an_artifact_cannot_be_fetched():
+    log = Log()
+    jobs = [job("a", Component("ndk", log)), job("b", Component("gapps", log, fail="download"))]
+    built = []
+    with pytest.raises(OSError, match="download of gapps failed"):
+        matrix.run_matrix(jobs, built.append, workers=2)
+    assert built == [] and not any(phase == "copy" for phase, _ in log)
+
+def test_cached_layers_are_not_staged():
+    log = Log()
+    cached = job("a", Component("ndk", log))
+    cached.layers = {"a"}
+    assert cached.components == []
+    assert matrix.run_matrix([cached], lambda job: None, workers=1) == []
+    assert log == []
@@ -0,0 +1,54 @@
+import math
+import os
+
+from tools import metrics
+from tools.metrics import Registry
+
+def test_render_textfile_format():
+    registry = Registry()
+    downloads = registry.counter("redroid_download_bytes_total", "Bytes downloaded per component")
+    staged = registry.gauge("redroid_staged_bytes", "Bytes staged")
+    phases = registry.histogram("redroid_phase_seconds", "Seconds per phase", buckets=(1, 5, math.inf))
+    downloads.inc(100, component="Gapps")
+    downloads.inc(50, component="Gapps")
+    downloads.inc(7, component='a "b"\\c\nd')
+    staged.set(1024, addon="gapps", image="redroid/redroid:13.0.0_gapps")
+    phases.observe(0.5, component="Ndk", phase="copy")
+    phases.observe(3, component="Ndk", phase="copy")
+    phases.observe(7.25, component="Ndk", phase="copy")
+
+    assert registry.render().splitlines() == [
+        "# HELP redroid_download_bytes_total Bytes downloaded per component",
+        "# TYPE redroid_download_bytes_total counter",
+        'redroid_download_bytes_total{component="Gapps"} 150',
+        'redroid_download_bytes_total{component="a \\"b\\"\\\\c\\nd"} 7',
+        "# HELP redroid_staged_bytes Bytes staged",
+        "# TYPE redroid_staged_bytes gauge",
+        'redroid_staged_bytes{addon="gapps",image="redroid/redroid:13.0.0_gapps"} 1024',
+        "# HELP redroid_phase_seconds Seconds per phase",
+        "# TYPE redroid_phase_seconds histogram",
+        'redroid_phase_seconds_bucket{component="Ndk",phase="copy",le="1"} 1',
+        'redroid_phase_seconds_bucket{component="Ndk",phase="copy",le="5"} 2',
+        'redroid_phase_seconds_bucket{component="Ndk",phase="copy",le="+Inf"} 3',
+        'redroid_phase_seconds_sum{component="Ndk",phase="copy"} 10.75',
+        'redroid_phase_seconds_count{component="Ndk",phase="copy"} 3',
+    ]
+
+def test_unlabelled_and_empty_metrics():
+    registry = Registry()
+    registry.counter("unused_total", "Never incremented")
+    registry.gauge("end_seconds", "End").set(1.5)
+    assert registry.render() == ("# HELP unused_total Never incremented\n# TYPE unused_total counter\n"
+                                 "# HELP end_seconds End\n# TYPE end_seconds gauge\nend_seconds 1.5\n")
+
+def test_write_is_atomic(tmp_path):
+    registry = Registry()
+    registry.counter("runs_total", "Runs").inc()
+    path = str(tmp_path / "redroid.prom")
+
+    registry.write(path)
+
+    assert os.listdir(tmp_path) == ["redroid.prom"]
+    with open(path) as f:
+        assert "runs_total 1\n" in f.read()
+    assert metrics.RUN_END.values[()] > 0
@@ -0,0 +1,54 @@
+import os
+
+from stuff.gapps import package_name
+from stuff.package_selection import PackageSelection, copy_system
+
+PACKAGES = [package_name(f) for f in ("gmscore-x86_64.tar.lz", "vending-common.tar.lz", "googletts-x86_64.tar.lz")]
+
+def test_wants():
+    assert PackageSelection.create().wants("gmscore", "PrebuiltGmsCore")
+    selection = PackageSelection.create(include=["GmsCore"], exclude=["Velvet"])
+    assert selection.wants("gmscore", "PrebuiltGmsCore")
+    assert selection.wants("googletts", "GmsCore")
+    assert not selection.wants("googletts", "GoogleTTS")
+    assert not selection.wants("gmscore", "velvet")
+    assert not PackageSelection.create(exclude=["gmscore"]).wants("GmsCore")
+
+def test_package_includes_skip_other_packages():
+    selection = PackageSelection.create(include=["gmscore"])
+    assert not selection.skips_package("gmscore", PACKAGES)
+    assert selection.skips_package("googletts", PACKAGES)
+
+def test_app_includes_keep_every_package_unpacked():
+    selection = PackageSelection.create(include=["PrebuiltGmsCore"], exclude=["googletts"])
+    assert not selection.skips_package("gmscore", PACKAGES)
+    assert not selection.skips_package("vending", PACKAGES)
+    assert selection.skips_package("googletts", PACKAGES)
+    assert selection.wants("gmscore", "PrebuiltGmsCore")
+    assert not selection.wants("gmscore", "GmsCoreSetupPrebuilt")
+
+def test_dpi_names():
+    assert PackageSelection.create(dpi="xhdpi").dpi == 320
+    assert PackageSelection.create(dpi="400").dpi == 400
+    assert PackageSelection.create(include=["A"]).as_dict() == {"include": ["a"], "exclude": [], "dpi": None}
+
+def test_best_dpi():
+    dirs = ["nodpi", "160", "240-320", "480", "640"]
+    assert PackageSelection.create().best_dpi(dirs) == "nodpi"
+    assert PackageSelection.create().best_dpi(["160", "480"]) == "480"
+    assert PackageSelection.create(dpi=320).best_dpi(dirs) == "240-320"
+    assert PackageSelection.create(dpi=320).best_dpi(["320-480", "320"]) == "320"
+    assert PackageSelection.create(dpi=400).best_dpi(dirs) == "480"
+    assert PackageSelection.create(dpi=800).best_dpi(dirs) == "640"
+    assert PackageSelection.create(dpi=320).best_dpi(["common"]) == "common"
+
+def test_copy_system_leaves_out_unwanted_apps(tmp_path):
+    for app in ("app/Chrome", "app/YouTube", "priv-app/Phonesky", "etc/permissions"):
+        os.makedirs(tmp_path / "src" / app)
+        (tmp_path / "src" / app / "file").write_text("x" * 10)
+
+    saved = copy_system(str(tmp_path / "src"), str(tmp_path / "dst"), PackageSelection.create(exclude=["youtube"]))
+
+    assert saved == 10
+    assert sorted(os.listdir(tmp_path / "dst" / "app")) == ["Chrome"]
+    assert os.listdir(tmp_path / "dst" / "etc" / "permissions") == ["file"]
@@ -0,0 +1,28 @@
+import json
+import platform
+import sys
+
+import pytest
+
+import redroid
+from tools import helper, plan
+
+@pytest.fixture
+def arm64_host(monkeypatch):
+    monkeypatch.setattr(platform, "machine", lambda: "aarch64")
+    helper.probe_host.cache_clear()
+    yield
+    helper.probe_host.cache_clear()
+
+def test_json_plan_is_the_only_stdout(arm64_host, monkeypatch, capsys):
+    monkeypatch.setattr(plan, "remote_size", lambda url: None)
+    # Houdini is rejected on arm64, so there is a compatibility warning as well
+    monkeypatch.setattr(sys, "argv", ["redroid.py", "--plan", "json", "-w", "-n", "-i", "-a", "13.0.0"])
+
+    redroid.main()
+
+    out, err = capsys.readouterr()
+    build_plan = json.loads(out)
+    assert [build["image"] for build in build_plan["builds"]] == ["redroid/redroid:13.0.0_ndk_widevine"]
+    assert build_plan["unknown_sizes"] == len(build_plan["artifacts"])
+    assert "Detected ARM64 architecture" in err and "without houdini" in err
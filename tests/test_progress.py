@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from tools import progress
+from tools.progress import Bar, Display, NullBar
+
+class Terminal(io.StringIO):
+    def __init__(self, tty=True):
+        super().__init__()
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+@pytest.mark.parametrize("stream_tty, stdout_tty, drawn", [(True, True, True), (True, False, False), (False, True, False)])
+def test_bars_are_only_drawn_when_stdout_and_stream_are_terminals(monkeypatch, stream_tty, stdout_tty, drawn):
+    monkeypatch.setattr(progress.sys, "stdout", Terminal(stdout_tty))
+    display = Display(Terminal(stream_tty))
+
+    with display.bar("gapps.zip", 100) as bar:
+        bar.update(100)
+
+    assert isinstance(bar, Bar if drawn else NullBar)
+    assert ("gapps.zip" in display.stream.getvalue()) == drawn
+    assert display.thread is None
+
+def test_concurrent_transfers_get_a_total_line(monkeypatch):
+    monkeypatch.setattr(progress.sys, "stdout", Terminal())
+    display = Display(Terminal())
+    first, second = display.bar("gapps.zip", 3 * 1024 ** 2), display.bar("ndk.zip", 1024 ** 2)
+    first.update(1024 ** 2)
+    second.update(1024 ** 2)
+
+    with display.lock:
+        display._draw()
+    block = display.stream.getvalue().split("\x1b[2K")[-3:]
+    first.close()
+    second.close()
+
+    assert [line.split()[0] for line in block] == ["gapps.zip", "ndk.zip", "total"]
+    assert "2.0/4.0 MiB" in block[2]
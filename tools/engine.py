@@ -0,0 +1,175 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import tarfile
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+
+from tools.helper import bcolors, print_color
+from tools import metrics
+from tools.trace import TRACER, span
+
+# Bytes moved per read from the context pipe
+CHUNK_SIZE = 64 * 1024
+
+class BuildError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class BuildEvent:
+    """One message of the engine's JSON build stream"""
+    time: float
+    kind: str  # step, output, status, error or image
+    text: str
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def socket_path(container):
+    """API socket of docker or podman, or None if there is none to talk to"""
+    host = os.environ.get("CONTAINER_HOST" if container == "podman" else "DOCKER_HOST", "")
+    if host.startswith("unix://"):
+        candidates = [host[len("unix://"):]]
+    elif host:
+        return None
+    elif container == "podman":
+        candidates = [os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/run/user/{}".format(os.getuid())), "podman", "podman.sock"),
+                      "/run/podman/podman.sock"]
+    else:
+        candidates = ["/var/run/docker.sock"]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+def _write_context(root, entries, fd, errors):
+    """Tar the Dockerfile and entries of root into the pipe fd as they are read"""
+    try:
+        with os.fdopen(fd, "wb") as pipe, tarfile.open(fileobj=pipe, mode="w|") as tar:
+            for entry in ["Dockerfile"] + list(entries):
+                tar.add(os.path.join(root, entry), arcname=entry)
+    except BrokenPipeError:
+        # The engine stopped reading, its response carries the reason
+        pass
+    except Exception as e:
+        errors.append(e)
+
+def _read_context(pipe):
+    while True:
+        chunk = pipe.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+def parse_events(lines):
+    """Turn the engine's JSON lines into BuildEvents"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        message = json.loads(line)
+        now = time.time()
+        if "error" in message:
+            yield BuildEvent(now, "error", message["error"])
+        elif "stream" in message:
+            text = message["stream"]
+            yield BuildEvent(now, "step" if text.startswith("Step ") else "output", text)
+        elif "status" in message:
+            yield BuildEvent(now, "status", message["status"])
+        elif "ID" in message.get("aux", {}):
+            yield BuildEvent(now, "image", message["aux"]["ID"])
+
+def step_timings(events, end):
+    """(step, start, seconds) for each "Step n/m" event, a step lasting until the next one"""
+    steps = [event for event in events if event.kind == "step"]
+    return [(step.text.strip(), step.time, (steps[i + 1].time if i + 1 < len(steps) else end) - step.time)
+            for i, step in enumerate(steps)]
+
+def api_build(conn, root, entries, tag):
+    """Build root over a connected engine API, uploading the context while it is tarred
+
+    Returns the list of BuildEvents; raises BuildError if the engine reports one.
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+    writer = threading.Thread(target=_write_context, args=(root, entries, write_fd, errors), daemon=True)
+    writer.start()
+
+    events = []
+    try:
+        with os.fdopen(read_fd, "rb") as pipe:
+            query = urllib.parse.urlencode({"t": tag, "dockerfile": "Dockerfile", "rm": 1})
+            conn.request("POST", "/build?" + query, body=_read_context(pipe),
+                         headers={"Content-Type": "application/x-tar"}, encode_chunked=True)
+        response = conn.getresponse()
+        if response.status != 200:
+            raise BuildError("Build of {} failed: HTTP {} {}".format(tag, response.status, response.read().decode(errors="replace").strip()))
+        for event in parse_events(response):
+            events.append(event)
+            if event.kind in ("step", "output"):
+                print(event.text, end="")
+            elif event.kind == "error":
+                raise BuildError("Build of {} failed: {}".format(tag, event.text.strip()))
+    finally:
+        conn.close()
+        # The read end is closed by now, so a writer still producing gets EPIPE
+        writer.join()
+    if errors:
+        raise errors[0]
+    return events
+
+def cli_build(container, root, tag):
+    result = subprocess.run([container, "build", "-t", tag, root])
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, result.args)
+    return []
+
+def build(container, root, entries, tag):
+    """Build the image tag from the Dockerfile and entries of root
+
+    Talks to the engine API when its socket is reachable, so the context is
+    uploaded while it is being tarred and per-step timings can be reported;
+    otherwise runs the container CLI.
+    """
+    start = time.time()
+    result = "failure"
+    try:
+        events = _build(container, root, entries, tag)
+        result = "success"
+        return events
+    finally:
+        metrics.BUILD_SECONDS.observe(time.time() - start, result=result)
+
+def _build(container, root, entries, tag):
+    with span("build " + tag, "build"):
+        path = socket_path(container)
+        if path is None:
+            return cli_build(container, root, tag)
+        conn = UnixHTTPConnection(path)
+        try:
+            conn.connect()
+        except OSError as e:
+            print_color("Cannot talk to {} over {} ({}), using the CLI".format(container, path, e), bcolors.YELLOW)
+            return cli_build(container, root, tag)
+
+        start = time.time()
+        events = api_build(conn, root, entries, tag)
+        end = time.time()
+    for step, step_start, seconds in step_timings(events, end):
+        print("{:>8.1f}s  {}".format(seconds, step))
+        if TRACER.enabled:
+            TRACER.add(step, "build step", step_start, step_start + seconds)
+    print_color("Build of {} took {:.1f}s".format(tag, end - start), bcolors.GREEN)
+    return events
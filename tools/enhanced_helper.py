@@ -1,10 +1,11 @@
 import os
-import platform
 import subprocess
 import requests
-from tqdm import tqdm
 import hashlib
 import time
+from tools import metrics
+from tools.helper import probe_host, stream
+from tools.progress import DOWNLOAD_CHUNK, progress
 from tools.logger import get_logger
 
 # Enhanced helper functions with logging
@@ -27,28 +28,21 @@ def run(args):
 
     start_time = time.time()
     try:
-        result = subprocess.run(args=args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        result = stream(args, on_line=logger.debug)
+    except subprocess.CalledProcessError as e:
         execution_time = time.time() - start_time
-
-        logger.log_command_execution(args, result.returncode, result.stdout, result.stderr)
-
-        if result.stderr and result.returncode != 0:
-            logger.error(f"Command failed in {execution_time:.2f}s: {result.stderr}")
-            raise subprocess.CalledProcessError(
-                returncode=result.returncode,
-                cmd=result.args,
-                stderr=result.stderr,
-                stdout=result.stdout
-            )
-        else:
-            logger.debug(f"Command completed successfully in {execution_time:.2f}s")
-
-        return result
+        logger.log_command_execution(args, e.returncode, e.output)
+        logger.error(f"Command failed in {execution_time:.2f}s: {e.output}")
+        raise
     except Exception as e:
         execution_time = time.time() - start_time
         logger.error(f"Command execution failed after {execution_time:.2f}s: {e}")
         raise
 
+    logger.log_command_execution(args, result.returncode)
+    logger.debug(f"Command completed successfully in {time.time() - start_time:.2f}s")
+    return result
+
 def download_file(url, f_name):
     """Enhanced download function with detailed logging"""
     logger.log_download_start(url, f_name)
@@ -65,22 +59,14 @@ def download_file(url, f_name):
             response.raise_for_status()
 
             total_size_in_bytes = int(response.headers.get('content-length', 0))
-            block_size = 8192  # Increased block size for better performance
-
             logger.debug(f"Starting download: {total_size_in_bytes} bytes")
 
-            progress_bar = tqdm(
-                total=total_size_in_bytes,
-                unit='B',
-                unit_scale=True,
-                desc=f"Downloading {os.path.basename(f_name)}"
-            )
-
             downloaded = 0
             last_log_time = time.time()
 
-            with open(f_name, 'wb') as file:
-                for data in response.iter_content(block_size):
+            with progress(f"Downloading {os.path.basename(f_name)}", total_size_in_bytes) as progress_bar, \
+                    open(f_name, 'wb') as file:
+                for data in response.iter_content(DOWNLOAD_CHUNK):
                     progress_bar.update(len(data))
                     file.write(data)
                     downloaded += len(data)
@@ -91,8 +77,6 @@ def download_file(url, f_name):
                         logger.log_download_progress(f_name, downloaded, total_size_in_bytes)
                         last_log_time = current_time
 
-            progress_bar.close()
-
             # Calculate MD5
             with open(f_name, "rb") as f:
                 file_bytes = f.read()
@@ -109,6 +93,7 @@ def download_file(url, f_name):
         except Exception as e:
             logger.error(f"Download attempt {attempt + 1} failed: {e}")
             if attempt < max_retries - 1:
+                metrics.RETRIES.inc(operation="download", reason=type(e).__name__, component=os.path.basename(f_name))
                 logger.info(f"Retrying in {retry_delay} seconds...")
                 time.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
@@ -118,25 +103,10 @@ def download_file(url, f_name):
 
 def host():
     """Enhanced host detection with logging"""
-    machine = platform.machine()
-    logger.debug(f"Detected machine architecture: {machine}")
-
-    mapping = {
-        "i686": ("x86", 32),
-        "x86_64": ("x86_64", 64),
-        "aarch64": ("arm64", 64),
-        "armv7l": ("arm", 32),
-        "armv8l": ("arm", 32)
-    }
-
-    if machine in mapping:
-        result = mapping[machine]
-        logger.info(f"Using architecture: {result[0]} ({result[1]}-bit)")
-        return result
-
-    error_msg = f"Unsupported architecture: {machine}"
-    logger.error(error_msg)
-    raise ValueError(error_msg)
+    info = probe_host()
+    logger.debug(f"Detected machine architecture: {info.machine}")
+    logger.info(f"Using architecture: {info.arch} ({info.bits}-bit)")
+    return (info.arch, info.bits)
 
 def verify_file_integrity(file_path, expected_md5=None, expected_size=None):
     """Verify file integrity with optional MD5 and size checks"""
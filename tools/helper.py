@@ -1,9 +1,16 @@
+import collections
+import functools
 import os
 import platform
+import struct
 import subprocess
-import requests
-from tqdm import tqdm
 import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from tools import metrics
+from tools.progress import DOWNLOAD_CHUNK, progress
+from tools.trace import span
 
 def get_download_dir():
     download_loc = ""
@@ -15,18 +22,57 @@ def get_download_dir():
         os.makedirs(download_loc)
     return download_loc
 
-def run(args):
-    result = subprocess.run(args=args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.stderr:
-        print(result.stderr.decode("utf-8"))
-        raise subprocess.CalledProcessError(
-                    returncode = result.returncode,
-                    cmd = result.args,
-                    stderr = result.stderr
-                )
-    return result
+# Output lines kept per command for error reports
+RUN_TAIL_LINES = 50
+
+def stream(args, on_line=None, tail=RUN_TAIL_LINES):
+    """Run a command, passing each line of its merged stdout/stderr to on_line
+
+    Only the last `tail` lines are kept, so chatty commands such as tar -v run
+    in constant memory. Failure is decided by the exit code alone; the kept
+    tail is attached to the raised CalledProcessError.
+    """
+    lines = collections.deque(maxlen=tail)
+    with span("run " + os.path.basename(args[0]), "command", argv=" ".join(args)), \
+            subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace") as proc:
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            lines.append(line)
+            if on_line:
+                on_line(line)
+    output = "\n".join(lines)
+    metrics.COMMANDS.inc(command=os.path.basename(args[0]), result="success" if proc.returncode == 0 else "failure")
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, args, output=output)
+    return subprocess.CompletedProcess(args, proc.returncode, stdout=output)
+
+def run(args, on_line=None):
+    try:
+        return stream(args, on_line)
+    except subprocess.CalledProcessError as e:
+        print(e.output)
+        raise
+
+@functools.lru_cache(maxsize=None)
+def command_pool():
+    """Shared pool bounding how many commands run_async runs at once (REDROID_MAX_COMMANDS, defaults to the cores)"""
+    workers = int(os.environ.get("REDROID_MAX_COMMANDS", 0)) or probe_host().cores
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="redroid-run")
+
+def run_async(args, on_line=None):
+    """Queue run(args) on the command pool and return its Future"""
+    return command_pool().submit(run, args, on_line)
+
+def wait_all(futures):
+    """Wait for every future, then raise the first failure"""
+    wait(futures)
+    for future in futures:
+        future.result()
 
 def download_file(url, f_name):
+    # Imported here so commands that never download skip the import cost
+    import requests
+
     md5 = ""
     try:
         response = requests.get(url, stream=True, timeout=30)
@@ -36,12 +82,13 @@ def download_file(url, f_name):
         raise
     
     total_size_in_bytes = int(response.headers.get('content-length', 0))
-    block_size = 1024  # 1 Kibibyte
-    progress_bar = tqdm(total=total_size_in_bytes, unit='iB', unit_scale=True)
+    progress_bar = progress(os.path.basename(f_name), total_size_in_bytes)
+    downloaded = 0
     
     try:
         with open(f_name, 'wb') as file:
-            for data in response.iter_content(block_size):
+            for data in response.iter_content(DOWNLOAD_CHUNK):
+                downloaded += len(data)
                 progress_bar.update(len(data))
                 file.write(data)
         progress_bar.close()
@@ -50,7 +97,7 @@ def download_file(url, f_name):
             bytes = f.read()
             md5 = hashlib.md5(bytes).hexdigest()
             
-        if total_size_in_bytes != 0 and progress_bar.n != total_size_in_bytes:
+        if total_size_in_bytes != 0 and downloaded != total_size_in_bytes:
             raise ValueError("Something went wrong while downloading")
             
     except Exception as e:
@@ -61,9 +108,69 @@ def download_file(url, f_name):
         
     return md5
 
-def host():
+# AT_HWCAP bits of arm64 that matter for translation layers (asm/hwcap.h)
+ARM64_HWCAPS = {0: "fp", 1: "asimd", 3: "aes", 4: "pmull", 5: "sha1", 6: "sha2", 7: "crc32", 8: "atomics"}
+AT_HWCAP = 16
+
+@dataclass(frozen=True)
+class HostInfo:
+    """What the build host can run, probed once per process"""
+    machine: str
+    arch: str
+    bits: int
+    flags: frozenset
+    cores: int
+    binfmt_handlers: tuple
+
+    @property
+    def native_bridge(self):
+        """True when binfmt_misc already routes foreign ELF binaries to a translator"""
+        return any(h.startswith(("arm", "aarch64", "qemu-arm", "qemu-aarch64")) for h in self.binfmt_handlers)
+
+def _cpu_flags():
+    flags = set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                # x86 reports "flags", arm "Features"
+                if key.strip() in ("flags", "Features"):
+                    flags.update(value.split())
+                    break
+    except OSError:
+        pass
+    return flags
+
+def _auxv_hwcap():
+    """AT_HWCAP from the aux vector, which is still readable when /proc/cpuinfo is masked"""
+    word = struct.calcsize("L")
+    try:
+        with open("/proc/self/auxv", "rb") as f:
+            data = f.read()
+    except OSError:
+        return 0
+    for offset in range(0, len(data) - 2 * word + 1, 2 * word):
+        key, value = struct.unpack_from("LL", data, offset)
+        if key == AT_HWCAP:
+            return value
+    return 0
+
+def _binfmt_handlers():
+    try:
+        return tuple(sorted(n for n in os.listdir("/proc/sys/fs/binfmt_misc") if n not in ("register", "status")))
+    except OSError:
+        return ()
+
+def _cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+@functools.lru_cache(maxsize=None)
+def probe_host():
+    """Probe cpuinfo, auxv and binfmt_misc once and return a HostInfo"""
     machine = platform.machine()
-    
+
     mapping = {
         "i686": ("x86", 32),
         "x86_64": ("x86_64", 64),
@@ -72,36 +179,28 @@ def host():
         "armv8l": ("arm", 32),
         "arm64": ("arm64", 64),    # Alternative ARM64 detection
     }
-    
-    if machine in mapping:
-        arch, bits = mapping[machine]
-        
-        # Additional ARM64 detection for various systems
-        if arch == "arm64" or machine == "aarch64":
-            # Verify ARM64 capability
-            try:
-                with open("/proc/cpuinfo", "r") as f:
-                    cpuinfo = f.read()
-                    if "aarch64" in cpuinfo or "arm64" in cpuinfo:
-                        print_color(f"Detected ARM64 architecture: {machine}", bcolors.GREEN)
-                        return ("arm64", 64)
-            except:
-                pass
-        
-        # x86_64 SSE4.2 check (keeping original logic)
-        if arch == "x86_64":
-            try:
-                with open("/proc/cpuinfo") as f:
-                    if "sse4_2" not in f.read():
-                        print_color("x86_64 CPU does not support SSE4.2, falling back to x86...", bcolors.YELLOW)
-                        return ("x86", 32)
-            except:
-                pass
-                
-        return mapping[machine]
-    
-    raise ValueError("platform.machine '" + machine + "'"
-                     " architecture is not supported. Supported architectures: x86, x86_64, arm, arm64/aarch64")
+
+    if machine not in mapping:
+        raise ValueError("platform.machine '" + machine + "'"
+                         " architecture is not supported. Supported architectures: x86, x86_64, arm, arm64/aarch64")
+
+    arch, bits = mapping[machine]
+    flags = _cpu_flags()
+    if arch == "arm64":
+        hwcap = _auxv_hwcap()
+        flags.update(name for bit, name in ARM64_HWCAPS.items() if hwcap & (1 << bit))
+        print_color(f"Detected ARM64 architecture: {machine}", bcolors.GREEN)
+
+    # x86_64 SSE4.2 check (keeping original logic)
+    if arch == "x86_64" and flags and "sse4_2" not in flags:
+        print_color("x86_64 CPU does not support SSE4.2, falling back to x86...", bcolors.YELLOW)
+        arch, bits = "x86", 32
+
+    return HostInfo(machine, arch, bits, frozenset(flags), _cores(), _binfmt_handlers())
+
+def host():
+    info = probe_host()
+    return (info.arch, info.bits)
 
 def detect_container_runtime():
     """Detect available container runtime (docker or podman)"""
@@ -119,14 +218,9 @@ def detect_container_runtime():
 
 def verify_android_version_support(version, arch):
     """Verify if the Android version is supported for the given architecture"""
-    supported_versions = {
-        "arm64": ["11.0.0", "12.0.0", "12.0.0_64only", "13.0.0", "13.0.0_64only", "14.0.0", "14.0.0_64only", "15.0.0", "15.0.0_64only"],
-        "x86_64": ["8.1.0", "9.0.0", "10.0.0", "11.0.0", "12.0.0", "12.0.0_64only", "13.0.0", "14.0.0", "15.0.0"],
-        "x86": ["8.1.0", "9.0.0", "10.0.0", "11.0.0", "12.0.0", "13.0.0", "14.0.0", "15.0.0"],
-        "arm": ["8.1.0", "9.0.0", "10.0.0", "11.0.0", "12.0.0", "13.0.0", "14.0.0"]
-    }
-    
-    return version in supported_versions.get(arch, [])
+    from stuff.compat import BASE_IMAGES
+
+    return version in BASE_IMAGES.get(arch, [])
 
 class bcolors:
     RED = '\033[31m'
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tarfile
+
+from tools.helper import bcolors, get_download_dir, print_color
+from tools import metrics
+from tools.trace import span
+from tools.workspace import file_lock
+
+# Bump when the layout of cached layer tarballs changes
+LAYER_FORMAT = 1
+
+def source_date_epoch():
+    """Timestamp used for reproducible layers (SOURCE_DATE_EPOCH, defaults to 0)"""
+    return int(os.environ.get("SOURCE_DATE_EPOCH", 0))
+
+def normalized_mode(mode):
+    """Collapse permission bits to 0755/0644 so builders with different umasks agree"""
+    if stat.S_ISDIR(mode) or mode & 0o111:
+        return 0o755
+    return 0o644
+
+@span("normalize_tree")
+def normalize_tree(root, epoch=None):
+    """Normalize timestamps, ownership and mode bits of everything under root"""
+    if epoch is None:
+        epoch = source_date_epoch()
+    chown = hasattr(os, "geteuid") and os.geteuid() == 0
+
+    # Walk bottom-up so touching children does not bump the parent's mtime afterwards
+    for parent, dirnames, filenames in os.walk(root, topdown=False):
+        for name in sorted(filenames) + sorted(dirnames):
+            path = os.path.join(parent, name)
+            st = os.lstat(path)
+            if chown:
+                os.lchown(path, 0, 0)
+            if not stat.S_ISLNK(st.st_mode):
+                os.chmod(path, normalized_mode(st.st_mode))
+            os.utime(path, (epoch, epoch), follow_symlinks=False)
+    if chown:
+        os.lchown(root, 0, 0)
+    os.chmod(root, 0o755)
+    os.utime(root, (epoch, epoch))
+
+def write_layer(src, dest, epoch=None):
+    """Pack src into a deterministic tarball: sorted entries, root ownership, fixed mtimes and modes"""
+    if epoch is None:
+        epoch = source_date_epoch()
+    tmp = dest + ".tmp"
+    with tarfile.open(tmp, "w", format=tarfile.GNU_FORMAT) as tar:
+        for parent, dirnames, filenames in os.walk(src):
+            dirnames.sort()
+            for name in sorted(dirnames + filenames):
+                path = os.path.join(parent, name)
+                info = tar.gettarinfo(path, arcname=os.path.relpath(path, src))
+                info.uid = info.gid = 0
+                info.uname = info.gname = ""
+                info.mtime = epoch
+                if not info.issym():
+                    info.mode = normalized_mode(os.lstat(path).st_mode)
+                if info.isreg():
+                    with open(path, "rb") as f:
+                        tar.addfile(info, f)
+                else:
+                    tar.addfile(info)
+    os.replace(tmp, dest)
+
+def layer_cache_dir():
+    layer_dir = os.path.join(os.path.dirname(get_download_dir()), "layers")
+    os.makedirs(layer_dir, exist_ok=True)
+    return layer_dir
+
+def layer_key(components, epoch=None):
+    """Digest of everything a staged copy dir is built from"""
+    inputs = {
+        "format": LAYER_FORMAT,
+        "epoch": source_date_epoch() if epoch is None else epoch,
+        "components": [component.layer_inputs() for component in components],
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def _link_layer(layer_path, workspace, name):
+    target = workspace.path(name + ".tar")
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(layer_path, target)
+    except OSError:
+        shutil.copyfile(layer_path, target)
+
+def cached_layer(components):
+    """Path of the cached layer tarball for components, or None"""
+    layer_path = os.path.join(layer_cache_dir(), layer_key(components) + ".tar")
+    return layer_path if os.path.isfile(layer_path) else None
+
+def use_cached_layers(selected, workspace):
+    """Link already built layers into workspace; returns the names that need no staging"""
+    cached = set()
+    for name, components in selected:
+        layer_path = cached_layer(components)
+        metrics.CACHE_LOOKUPS.inc(cache="layer", result="hit" if layer_path else "miss")
+        if layer_path:
+            print_color("Reusing cached {} layer {}".format(name, os.path.basename(layer_path)), bcolors.GREEN)
+            _link_layer(layer_path, workspace, name)
+            cached.add(name)
+    return cached
+
+@span("store_layers")
+def store_layers(selected, workspace, names):
+    """Pack the freshly staged copy dirs of names into the layer cache and link them into workspace"""
+    for name, components in selected:
+        if name not in names:
+            continue
+        layer_path = os.path.join(layer_cache_dir(), layer_key(components) + ".tar")
+        with file_lock(layer_path):
+            if not os.path.isfile(layer_path):
+                print_color("Caching {} layer {}".format(name, os.path.basename(layer_path)), bcolors.GREEN)
+                write_layer(components[0].copy_dir, layer_path)
+        _link_layer(layer_path, workspace, name)
@@ -0,0 +1,158 @@
+import json
+import math
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+from tools.log_index import load_index, open_log
+
+DB_FILE = "sessions.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    started TEXT,
+    closed INTEGER,
+    events INTEGER
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id TEXT NOT NULL,
+    time TEXT,
+    level TEXT,
+    action TEXT,
+    module TEXT,
+    image TEXT,
+    duration REAL,
+    message TEXT,
+    fields TEXT
+);
+CREATE INDEX IF NOT EXISTS events_session ON events (session_id);
+CREATE INDEX IF NOT EXISTS events_action ON events (action, time);
+CREATE INDEX IF NOT EXISTS events_module ON events (module, time);
+CREATE INDEX IF NOT EXISTS events_level ON events (level, time);
+"""
+
+# Entry keys stored in their own columns rather than in fields
+COLUMNS = {"timestamp", "level", "message", "action", "module_name", "image_name", "build_time"}
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+def module_of(entry):
+    """Component an entry is about: its module_name, else the name a downloaded file starts with"""
+    if entry.get("module_name"):
+        return entry["module_name"]
+    filename = entry.get("filename")
+    if filename:
+        return re.split(r"[-_.]", os.path.basename(str(filename)), 1)[0].lower()
+    return None
+
+def _row(session_id, entry):
+    return (session_id, entry.get("timestamp"), entry.get("level"), entry.get("action"), module_of(entry),
+            entry.get("image_name"), entry.get("build_time"), entry.get("message"),
+            json.dumps({k: v for k, v in entry.items() if k not in COLUMNS}, default=str))
+
+def _entries(f):
+    for line in f:
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+def ingest(db, log_dir):
+    """Load the structured logs of every indexed session not ingested in its final state yet
+
+    Closed sessions are loaded once; a session still running is reloaded on
+    every ingest. Returns {session_id: events loaded}.
+    """
+    done = {row[0] for row in db.execute("SELECT session_id FROM sessions WHERE closed = 1")}
+    loaded = {}
+    for session_id, entry in sorted(load_index(log_dir).items()):
+        name = entry["files"].get("structured")
+        if session_id in done or not name or not os.path.exists(os.path.join(log_dir, name)):
+            continue
+        with db, open_log(os.path.join(log_dir, name)) as f:
+            db.execute("DELETE FROM events WHERE session_id = ?", (session_id,))
+            cursor = db.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                    (_row(session_id, e) for e in _entries(f)))
+            started = datetime.fromtimestamp(entry["started"]).isoformat() if entry.get("started") else None
+            db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                       (session_id, started, int(entry["closed"]), cursor.rowcount))
+        loaded[session_id] = cursor.rowcount
+    return loaded
+
+def parse_since(value):
+    """ISO timestamp for "30d", "12h", "90m" or an ISO date"""
+    match = re.fullmatch(r"(\d+)([dhm])", value)
+    if match:
+        unit = {"d": "days", "h": "hours", "m": "minutes"}[match.group(2)]
+        return (datetime.now() - timedelta(**{unit: int(match.group(1))})).isoformat()
+    return datetime.fromisoformat(value).isoformat()
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+def _filters(module=None, since=None):
+    clauses, params = [], []
+    if module:
+        clauses.append("module = ?")
+        params.append(module)
+    if since:
+        clauses.append("time >= ?")
+        params.append(parse_since(since))
+    return "".join(" AND " + clause for clause in clauses), params
+
+def failed_downloads(db, module=None, since=None):
+    where, params = _filters(module, since)
+    return (["time", "session", "module", "message"],
+            db.execute("SELECT time, session_id, module, message FROM events "
+                       "WHERE action LIKE 'download%' AND level IN ('ERROR', 'CRITICAL')" + where +
+                       " ORDER BY time", params).fetchall())
+
+def errors(db, module=None, since=None):
+    where, params = _filters(module, since)
+    return (["time", "session", "module", "message"],
+            db.execute("SELECT time, session_id, module, message FROM events "
+                       "WHERE level IN ('ERROR', 'CRITICAL')" + where + " ORDER BY time", params).fetchall())
+
+def build_times(db, module=None, since=None):
+    """Count, p50, p95 and max of docker build seconds per image tag"""
+    where, params = _filters(module, since)
+    durations = {}
+    for image, duration in db.execute("SELECT image, duration FROM events WHERE action = 'docker_build_complete' "
+                                      "AND duration IS NOT NULL" + where + " ORDER BY image, duration", params):
+        durations.setdefault(image, []).append(duration)
+    return (["image", "builds", "p50", "p95", "max"],
+            [(image, len(values), round(percentile(values, 50), 2), round(percentile(values, 95), 2), round(values[-1], 2))
+             for image, values in durations.items()])
+
+def sessions(db, module=None, since=None):
+    where, params = _filters(module, since)
+    return (["session", "events", "errors", "downloads", "builds"],
+            db.execute("SELECT session_id, COUNT(*), SUM(level IN ('ERROR', 'CRITICAL')), "
+                       "SUM(action = 'download_complete'), SUM(action = 'docker_build_complete') "
+                       "FROM events WHERE 1" + where + " GROUP BY session_id ORDER BY session_id", params).fetchall())
+
+QUERIES = {
+    "failed-downloads": failed_downloads,
+    "errors": errors,
+    "build-times": build_times,
+    "sessions": sessions,
+}
+
+def sql(db, statement):
+    cursor = db.execute(statement)
+    return [column[0] for column in cursor.description or ()], cursor.fetchall()
+
+def print_table(columns, rows):
+    rows = [["" if value is None else str(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)).rstrip())
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
@@ -0,0 +1,211 @@
+import fcntl
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_FILE = "sessions.json"
+LOCK_FILE = ".sessions.lock"
+
+# Files a session may leave behind, by kind
+SESSION_FILES = {
+    "detailed": "detailed_{}.log",
+    "errors": "errors_{}.log",
+    "structured": "structured_{}.json",
+    "issue_report": "issue_report_{}.json",
+}
+SESSION_PATTERN = re.compile(r"(detailed|errors|structured|issue_report)_(\d{8}_\d{6}(?:_\d+)?)\.(log|json)(\.gz|\.zst)?$")
+
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """What is kept of closed sessions; a limit of None means unlimited
+
+    The current session is never removed and the latest closed one is only
+    compressed once the session after it starts, so the latest_* links keep
+    pointing at plain text.
+    """
+    max_sessions: int = 100
+    max_bytes: int = None
+    max_age_days: float = 30
+    compression: str = "gzip"  # gzip, zstd or none
+
+    @classmethod
+    def from_env(cls):
+        """Policy from REDROID_LOG_MAX_SESSIONS/_MAX_BYTES/_MAX_AGE_DAYS/_COMPRESSION, 0 lifting a limit"""
+        def limit(name, default, kind):
+            value = os.environ.get(name)
+            if value is None:
+                return default
+            return kind(value) or None
+
+        compression = os.environ.get("REDROID_LOG_COMPRESSION", cls.compression)
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        return cls(limit("REDROID_LOG_MAX_SESSIONS", cls.max_sessions, int),
+                   limit("REDROID_LOG_MAX_BYTES", cls.max_bytes, int),
+                   limit("REDROID_LOG_MAX_AGE_DAYS", cls.max_age_days, float),
+                   compression)
+
+def open_log(path, mode="rt"):
+    """Open a session file whether it is plain, gzip or zstd compressed"""
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("{} is zstd compressed, install zstandard to read it".format(path))
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+def scan_sessions(log_dir):
+    """Index built from the file names in log_dir, for directories from before the index"""
+    sessions = {}
+    for name in os.listdir(log_dir):
+        match = SESSION_PATTERN.match(name)
+        if match:
+            entry = sessions.setdefault(match.group(2), {"pid": None, "started": None, "closed": True, "files": {}, "bytes": 0})
+            entry["files"][match.group(1)] = name
+            entry["bytes"] += os.path.getsize(os.path.join(log_dir, name))
+    for session_id, entry in sessions.items():
+        entry["started"] = time.mktime(time.strptime(session_id[:len("YYYYmmdd_HHMMSS")], "%Y%m%d_%H%M%S"))
+    return sessions
+
+def load_index(log_dir):
+    """Sessions of log_dir by session id, scanning the directory only if it has no index yet"""
+    try:
+        with open(os.path.join(log_dir, INDEX_FILE)) as f:
+            return json.load(f)["sessions"]
+    except FileNotFoundError:
+        return scan_sessions(log_dir)
+
+def save_index(log_dir, sessions):
+    path = os.path.join(log_dir, INDEX_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": 1, "sessions": sessions}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+@contextmanager
+def locked(log_dir):
+    """Serialize index updates of sessions running at the same time"""
+    with open(os.path.join(log_dir, LOCK_FILE), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _alive(pid):
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def compress_file(path, compression):
+    """Replace path by its compressed copy, keeping the mtime; returns the new path"""
+    target = path + COMPRESSED_SUFFIXES[compression]
+    tmp = target + ".tmp"
+    with open(path, "rb") as src:
+        if compression == "zstd":
+            with open(tmp, "wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+        else:
+            with gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+    stat = os.stat(path)
+    os.utime(tmp, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp, target)
+    os.remove(path)
+    return target
+
+def _compress_session(log_dir, entry, compression):
+    total = 0
+    for kind, name in entry["files"].items():
+        path = os.path.join(log_dir, name)
+        if not os.path.exists(path):
+            continue
+        if compression != "none" and not name.endswith(tuple(COMPRESSED_SUFFIXES.values())):
+            path = compress_file(path, compression)
+            entry["files"][kind] = os.path.basename(path)
+        total += os.path.getsize(path)
+    entry["bytes"] = total
+    entry["compression"] = compression
+
+def _remove_session(log_dir, entry):
+    for name in entry["files"].values():
+        try:
+            os.remove(os.path.join(log_dir, name))
+        except FileNotFoundError:
+            pass
+
+def expired(sessions, policy, now):
+    """Ids of closed sessions the policy drops, newest sessions being kept first"""
+    dropped = []
+    kept = total = 0
+    for session_id in sorted(sessions, reverse=True):
+        entry = sessions[session_id]
+        if not entry["closed"]:
+            continue
+        kept += 1
+        total += entry["bytes"]
+        if (policy.max_sessions is not None and kept > policy.max_sessions
+                or policy.max_bytes is not None and total > policy.max_bytes
+                or policy.max_age_days is not None and now - entry["started"] > policy.max_age_days * 86400):
+            dropped.append(session_id)
+    return dropped
+
+def register_session(log_dir, session_id, policy):
+    """Add a starting session to the index and tidy up after the ones before it
+
+    Sessions that were closed or whose process is gone get compressed, then
+    whatever the policy does not keep is deleted. An id already in the index
+    raises FileExistsError rather than taking over that session's files.
+    """
+    with locked(log_dir):
+        sessions = load_index(log_dir)
+        if session_id in sessions:
+            raise FileExistsError("session {} is already in the index".format(session_id))
+        for entry in sessions.values():
+            if not entry["closed"] and not _alive(entry["pid"]):
+                entry["closed"] = True
+            if entry["closed"] and "compression" not in entry:
+                _compress_session(log_dir, entry, policy.compression)
+        for old in expired(sessions, policy, time.time()):
+            _remove_session(log_dir, sessions.pop(old))
+        sessions[session_id] = {
+            "pid": os.getpid(),
+            "started": time.time(),
+            "closed": False,
+            "files": {kind: name.format(session_id) for kind, name in SESSION_FILES.items() if kind != "issue_report"},
+            "bytes": 0,
+        }
+        save_index(log_dir, sessions)
+
+def close_session(log_dir, session_id):
+    """Record the final files and size of a session whose logs are closed"""
+    with locked(log_dir):
+        sessions = load_index(log_dir)
+        entry = sessions.get(session_id)
+        if entry is None:
+            return
+        files = {kind: name.format(session_id) for kind, name in SESSION_FILES.items()}
+        entry["files"] = {kind: name for kind, name in files.items() if os.path.exists(os.path.join(log_dir, name))}
+        entry["bytes"] = sum(os.path.getsize(os.path.join(log_dir, name)) for name in entry["files"].values())
+        entry["closed"] = True
+        save_index(log_dir, sessions)
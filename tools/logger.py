@@ -1,11 +1,18 @@
+import atexit
 import logging
+import logging.handlers
+import math
 import os
+import queue
 import sys
 import json
+import threading
 import traceback
 from datetime import datetime
 from pathlib import Path
 
+from tools.log_index import RetentionPolicy, close_session, register_session
+
 # Define bcolors locally since tools.helper does not exist
 class bcolors:
     HEADER = '\033[95m'
@@ -21,13 +28,22 @@ class bcolors:
 class EnhancedLogger:
     """Enhanced logging system for ReDroid Enhanced script"""
 
-    def __init__(self, name="redroid_enhanced", log_dir="logs", log_level=logging.INFO):
+    def __init__(self, name="redroid_enhanced", log_dir="logs", log_level=logging.INFO, file_logging=None):
+        """Nothing touches the disk until the first record reaches the file handlers
+
+        file_logging=False (or REDROID_FILE_LOGGING=0) keeps the logs on the
+        console only.
+        """
         self.name = name
         self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
+        if file_logging is None:
+            file_logging = os.environ.get("REDROID_FILE_LOGGING", "1") != "0"
+        self.file_logging = file_logging
 
-        # Create timestamp for this session
-        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Timestamp of this session; the pid keeps runs started in the same second apart
+        self.session_id = "{}_{}".format(datetime.now().strftime("%Y%m%d_%H%M%S"), os.getpid())
+        self.writer = None
+        self.closed = False
 
         # Setup loggers
         self.logger = logging.getLogger(name)
@@ -45,9 +61,6 @@ class EnhancedLogger:
         )
         self.json_formatter = JsonFormatter()
 
-        # Setup handlers
-        self._setup_handlers()
-
         # Session info
         self.session_info = {
             "session_id": self.session_id,
@@ -65,16 +78,15 @@ class EnhancedLogger:
             }
         }
 
-        # Log session start
-        self.info("=" * 80)
-        self.info(f"Starting ReDroid Enhanced - Session ID: {self.session_id}")
-        self.info(f"Platform: {sys.platform} | Python: {sys.version.split()[0]}")
-        self.info(f"Working Directory: {os.getcwd()}")
-        self.info(f"Arguments: {' '.join(sys.argv)}")
-        self.info("=" * 80)
+        # Setup handlers
+        self._setup_handlers()
 
     def _setup_handlers(self):
-        """Setup all logging handlers"""
+        """Setup all logging handlers
+
+        The console stays synchronous; the file handlers are only created by
+        the first record that reaches them (see _start_session).
+        """
 
         # Console handler (colored output)
         console_handler = ColoredConsoleHandler()
@@ -82,30 +94,71 @@ class EnhancedLogger:
         console_handler.setFormatter(self.simple_formatter)
         self.logger.addHandler(console_handler)
 
+        if self.file_logging:
+            self.session_handler = SessionHandler(self._start_session)
+            self.logger.addHandler(self.session_handler)
+
+    def _start_session(self):
+        """Create the log files, index the session and write its banner; returns the handler feeding the files
+
+        The file handlers are fed from a queue by a background writer so
+        callers never wait on log file I/O.
+        """
+        self.log_dir.mkdir(exist_ok=True)
+
+        # Index the session before its files exist, tidying up older ones
+        try:
+            register_session(self.log_dir, self.session_id, RetentionPolicy.from_env())
+            index_error = None
+        except OSError as e:
+            index_error = e
+
+        file_handlers = []
+
         # Detailed file handler
         detailed_file = self.log_dir / f"detailed_{self.session_id}.log"
-        detailed_handler = logging.FileHandler(detailed_file)
+        detailed_handler = logging.FileHandler(detailed_file, delay=True)
         detailed_handler.setLevel(logging.DEBUG)
         detailed_handler.setFormatter(self.detailed_formatter)
-        self.logger.addHandler(detailed_handler)
+        file_handlers.append(detailed_handler)
 
-        # Error file handler
+        # Error file handler, only created once there is an error
         error_file = self.log_dir / f"errors_{self.session_id}.log"
-        error_handler = logging.FileHandler(error_file)
+        error_handler = logging.FileHandler(error_file, delay=True)
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(self.detailed_formatter)
-        self.logger.addHandler(error_handler)
+        file_handlers.append(error_handler)
 
         # JSON structured log handler
         json_file = self.log_dir / f"structured_{self.session_id}.json"
-        json_handler = logging.FileHandler(json_file)
+        json_handler = logging.FileHandler(json_file, delay=True)
         json_handler.setLevel(logging.DEBUG)
         json_handler.setFormatter(self.json_formatter)
-        self.logger.addHandler(json_handler)
+        file_handlers.append(json_handler)
+
+        self.writer = BackgroundWriter(file_handlers)
+        atexit.register(self.close)
+        handler = QueueHandler(self.writer)
 
         # Latest symlinks (for easy access to most recent logs)
         self._create_latest_symlinks()
 
+        # Session banner, for the files only
+        banner = [
+            "=" * 80,
+            f"Starting ReDroid Enhanced - Session ID: {self.session_id}",
+            f"Platform: {sys.platform} | Python: {sys.version.split()[0]}",
+            f"Working Directory: {os.getcwd()}",
+            f"Arguments: {' '.join(sys.argv)}",
+            "=" * 80,
+        ]
+        if index_error:
+            banner.append(f"Could not update the session index: {index_error}")
+        for line in banner:
+            handler.handle(self.logger.makeRecord(self.name, logging.INFO, __file__, 0, line, None, None,
+                                                  extra={"fields": {}}))
+        return handler
+
     def _create_latest_symlinks(self):
         """Create symlinks to latest log files"""
         symlinks = [
@@ -131,27 +184,27 @@ class EnhancedLogger:
 
     def debug(self, message, **kwargs):
         """Log debug message"""
-        self.logger.debug(message, extra=kwargs)
+        self.logger.debug(message, extra={"fields": kwargs})
 
     def info(self, message, **kwargs):
         """Log info message"""
-        self.logger.info(message, extra=kwargs)
+        self.logger.info(message, extra={"fields": kwargs})
 
     def warning(self, message, **kwargs):
         """Log warning message"""
-        self.logger.warning(message, extra=kwargs)
+        self.logger.warning(message, extra={"fields": kwargs})
 
     def error(self, message, **kwargs):
         """Log error message"""
-        self.logger.error(message, extra=kwargs)
+        self.logger.error(message, extra={"fields": kwargs})
 
     def critical(self, message, **kwargs):
         """Log critical message"""
-        self.logger.critical(message, extra=kwargs)
+        self.logger.critical(message, extra={"fields": kwargs})
 
     def exception(self, message, **kwargs):
         """Log exception with traceback"""
-        self.logger.exception(message, extra=kwargs)
+        self.logger.exception(message, extra={"fields": kwargs})
 
     def log_module_start(self, module_name, version=None):
         """Log module installation start"""
@@ -216,6 +269,9 @@ class EnhancedLogger:
 
     def create_issue_report(self, error_context=None):
         """Create a comprehensive issue report for debugging"""
+        self.start_session()
+        # Without file logging start_session() creates nothing, not even the directory
+        self.log_dir.mkdir(exist_ok=True)
         report_file = self.log_dir / f"issue_report_{self.session_id}.json"
 
         # Collect all relevant information
@@ -243,6 +299,16 @@ class EnhancedLogger:
         self.info(f"Issue report created: {report_file}")
         return report_file
 
+    def start_session(self):
+        """Create the session's log files now rather than on the first record"""
+        if self.file_logging:
+            self.session_handler.started()
+
+    def flush(self):
+        """Wait until everything logged so far is written to the log files"""
+        if self.writer:
+            self.writer.flush()
+
     def finalize(self):
         """Finalize logging session"""
         end_time = datetime.now()
@@ -252,6 +318,18 @@ class EnhancedLogger:
         self.info(f"Session completed - Duration: {session_duration:.2f}s")
         self.info(f"Log files location: {self.log_dir}")
         self.info("=" * 80)
+        self.flush()
+
+    def close(self):
+        """Close the log files and mark the session closed in the index"""
+        if self.closed or self.writer is None:
+            return
+        self.closed = True
+        self.writer.stop()
+        try:
+            close_session(self.log_dir, self.session_id)
+        except OSError:
+            pass
 
 
 class ColoredConsoleHandler(logging.StreamHandler):
@@ -267,6 +345,8 @@ class ColoredConsoleHandler(logging.StreamHandler):
 
     def emit(self, record):
         try:
+            # The same record is still queued for the log files, color a copy
+            record = logging.makeLogRecord(record.__dict__)
             color = self.COLORS.get(record.levelname, bcolors.ENDC)
             record.levelname = f"{color}{record.levelname}{bcolors.ENDC}"
             super().emit(record)
@@ -274,12 +354,148 @@ class ColoredConsoleHandler(logging.StreamHandler):
             self.handleError(record)
 
 
+class SessionHandler(logging.Handler):
+    """Starts the session's log files on the first record that gets here, then passes records on
+
+    Records are only offered to it once they passed the logger's level, so
+    a run that logs nothing at that level leaves no files behind.
+    """
+
+    def __init__(self, start):
+        super().__init__()
+        self.start = start
+        self.target = None
+
+    def started(self):
+        if self.target is None:
+            with self.lock:
+                if self.target is None:
+                    self.target = self.start()
+        return self.target
+
+    def handle(self, record):
+        return self.started().handle(record)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a BackgroundWriter without formatting them"""
+
+    def __init__(self, writer):
+        super().__init__(writer.queue)
+
+    def prepare(self, record):
+        # Resolve the message now, its arguments may change before the writer runs
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class BackgroundWriter:
+    """Thread draining queued records into file handlers in batches
+
+    Each batch is written with one flush per file instead of one per record.
+    Whatever is still queued is written at interpreter exit.
+    """
+
+    BATCH_SIZE = 512
+    # Seconds a batch waits for more records before it is written
+    BATCH_WINDOW = 0.05
+
+    _STOP = object()
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch = []
+            waiters = []
+            stop = False
+            while True:
+                if item is self._STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get(timeout=self.BATCH_WINDOW)
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        for handler in self.handlers:
+            records = [record for record in batch if record.levelno >= handler.level]
+            if not records:
+                continue
+            with handler.lock:
+                try:
+                    if handler.stream is None:
+                        handler.stream = handler._open()
+                    handler.stream.write("".join(handler.format(record) + handler.terminator for record in records))
+                    handler.flush()
+                except Exception:
+                    handler.handleError(records[0])
+
+    def flush(self):
+        if self.thread.is_alive():
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait()
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+        for handler in self.handlers:
+            handler.close()
+
+
 class JsonFormatter(logging.Formatter):
     """JSON formatter for structured logging"""
 
+    # LogRecord attributes already covered by the fixed fields or not worth keeping
+    RESERVED = frozenset([
+        'name', 'levelname', 'levelno', 'pathname', 'filename', 'module', 'lineno',
+        'funcName', 'created', 'msecs', 'relativeCreated', 'thread', 'threadName',
+        'processName', 'process', 'getMessage', 'exc_info', 'exc_text', 'stack_info',
+        'message', 'args', 'fields'])
+
+    def __init__(self):
+        super().__init__()
+        # isoformat() of the last whole second seen, records mostly arrive in bursts
+        self._second = None
+        self._second_text = None
+
+    def timestamp(self, created):
+        """Same text as datetime.fromtimestamp(created).isoformat(), formatted once per second"""
+        frac, second = math.modf(created)
+        us = round(frac * 1e6)
+        if us >= 1000000:
+            second += 1
+            us -= 1000000
+        cached = self._second, self._second_text
+        if cached[0] != second:
+            cached = second, datetime.fromtimestamp(second).isoformat()
+            self._second, self._second_text = cached
+        return "{}.{:06d}".format(cached[1], us) if us else cached[1]
+
     def format(self, record):
         log_entry = {
-            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "timestamp": self.timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -291,37 +507,51 @@ class JsonFormatter(logging.Formatter):
         }
 
         # Add extra fields if present
-        if hasattr(record, '__dict__'):
-            for key, value in record.__dict__.items():
-                if key not in ['name', 'levelname', 'levelno', 'pathname', 'filename',
-                              'module', 'lineno', 'funcName', 'created', 'msecs',
-                              'relativeCreated', 'thread', 'threadName', 'processName',
-                              'process', 'getMessage', 'exc_info', 'exc_text', 'stack_info',
-                              'message', 'args']:
-                    log_entry[key] = value
-        
-        # Handle custom module_name field
-        if hasattr(record, 'module_name'):
-            log_entry['module_name'] = record.module_name
-
-        # Add exception info if present
+        reserved = self.RESERVED
+        for key, value in record.__dict__.items():
+            if key not in reserved:
+                log_entry[key] = value
+        # EnhancedLogger keeps its fields apart, so names like filename cannot clash with LogRecord attributes
+        fields = getattr(record, "fields", None)
+        if fields:
+            log_entry.update(fields)
+
+        # Add exception info if present, reusing the text another formatter cached
         if record.exc_info:
-            log_entry["exception"] = self.formatException(record.exc_info)
+            log_entry["exception"] = record.exc_text or self.formatException(record.exc_info)
+
+        return dumps(log_entry)
 
-        return json.dumps(log_entry, default=str)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encode = json.JSONEncoder(default=str).encode
+
+def dumps(obj):
+    """json.dumps(obj, default=str), through orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str).decode()
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the json module handles
+            pass
+    return _encode(obj)
 
 
 # Global logger instance
 _logger = None
 
-def get_logger(name="redroid_enhanced", log_level=logging.INFO):
+def get_logger(name="redroid_enhanced", log_level=logging.INFO, file_logging=None):
     """Get or create global logger instance"""
     global _logger
     if _logger is None:
-        _logger = EnhancedLogger(name, log_level=log_level)
+        _logger = EnhancedLogger(name, log_level=log_level, file_logging=file_logging)
     return _logger
 
-def setup_logging(verbose=False, debug=False):
+def setup_logging(verbose=False, debug=False, file_logging=None):
     """Setup logging with different verbosity levels"""
     if debug:
         log_level = logging.DEBUG
@@ -330,4 +560,4 @@ def setup_logging(verbose=False, debug=False):
     else:
         log_level = logging.WARNING
 
-    return get_logger(log_level=log_level)
\ No newline at end of file
+    return get_logger(log_level=log_level, file_logging=file_logging)
\ No newline at end of file
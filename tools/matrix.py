@@ -0,0 +1,117 @@
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tools.helper import bcolors, print_color
+from tools.trace import span
+
+class MatrixJob:
+    """One image of a build matrix, staged in its own workspace"""
+
+    def __init__(self, name, android, selected, workspace):
+        self.name = name
+        self.android = android
+        self.selected = selected
+        self.workspace = workspace
+        # Addons served from cached layer tarballs need no download or staging
+        self.layers = set()
+
+    @property
+    def components(self):
+        return [component for name, components in self.selected if name not in self.layers for component in components]
+
+def load_spec(path):
+    """Load a build matrix spec file
+
+    {
+        "android": ["13.0.0", "14.0.0"],
+        "addons": [["litegapps", "mindthegapps"], ["magisk", "widevine"]],
+        "container": "docker",
+        "jobs": 4,
+        "workdir": "matrix",
+        "options": {"magisk_enhanced": {"preinstall_modules": true}}
+    }
+
+    Every entry of "addons" is an axis; one option is picked from each axis.
+    An option is an addon name, a list of addon names or null for none.
+    "options" holds extra constructor arguments per component.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    if not spec.get("android"):
+        raise ValueError("Matrix spec {} does not list any android version".format(path))
+    return spec
+
+def expand_spec(spec):
+    """Expand android versions x addon axes into unique (android, addons) combinations"""
+    axes = []
+    for axis in spec.get("addons", []):
+        options = []
+        for option in axis:
+            if option is None:
+                options.append(())
+            elif isinstance(option, str):
+                options.append((option,))
+            else:
+                options.append(tuple(option))
+        axes.append(options)
+
+    combinations = []
+    for android in spec["android"]:
+        for picks in itertools.product(*axes):
+            combination = (android, frozenset(itertools.chain.from_iterable(picks)))
+            if combination not in combinations:
+                combinations.append(combination)
+    return combinations
+
+def prepare(jobs, workers):
+    """Download and extract every distinct artifact of the matrix exactly once"""
+    artifacts = {}
+    for job in jobs:
+        for component in job.components:
+            artifacts.setdefault(component.artifact_key(), component)
+
+    print_color("Preparing {} artifacts for {} images ...".format(len(artifacts), len(jobs)), bcolors.GREEN)
+
+    def fetch(component):
+        component.run_phase("download")
+        component.run_phase("extract")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(fetch, c) for c in artifacts.values()]):
+            future.result()
+
+def run_matrix(jobs, build, workers):
+    """Stage and build all jobs with at most `workers` running at once
+
+    Components reading the same extracted artifact are staged one at a time,
+    since several of them unpack helper archives inside their extract dir.
+    Returns the list of (job, exception) pairs that failed.
+    """
+    prepare(jobs, workers)
+
+    locks = {}
+    for job in jobs:
+        for component in job.components:
+            locks.setdefault(component.artifact_key(), threading.Lock())
+
+    def stage_and_build(job):
+        with span(job.name, "job"):
+            for component in job.components:
+                with locks[component.artifact_key()]:
+                    component.run_phase("copy")
+            build(job)
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(stage_and_build, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+                print_color("Matrix job {} finished".format(job.name), bcolors.GREEN)
+            except Exception as e:
+                print_color("Matrix job {} failed: {}".format(job.name, e), bcolors.RED)
+                failures.append((job, e))
+    return failures
@@ -0,0 +1,128 @@
+import math
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the duration histograms
+SECONDS_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, math.inf)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(pairs):
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, help):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in sorted(self.values.items())]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.registry.lock:
+            self.values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, buckets=SECONDS_BUCKETS):
+        super().__init__(registry, name, help)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self.values[key] = counts, total + value
+
+    def samples(self):
+        samples = []
+        for key, (counts, total) in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, counts):
+                samples.append((self.name + "_bucket", key + (("le", _number(bound)),), count))
+            samples.append((self.name + "_sum", key, total))
+            samples.append((self.name + "_count", key, counts[-1]))
+        return samples
+
+class Registry:
+    """Metrics of this run, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help):
+        return self._add(Counter(self, name, help))
+
+    def gauge(self, name, help):
+        return self._add(Gauge(self, name, help))
+
+    def histogram(self, name, help, buckets=SECONDS_BUCKETS):
+        return self._add(Histogram(self, name, help, buckets))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append("# HELP {} {}".format(metric.name, metric.help))
+                lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+                for name, key, value in metric.samples():
+                    lines.append("{}{} {}".format(name, _labels(key), _number(value)))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write atomically, node_exporter's textfile collector must never see a partial file"""
+        RUN_END.set(time.time())
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+REGISTRY = Registry()
+
+DOWNLOAD_BYTES = REGISTRY.counter("redroid_download_bytes_total", "Bytes downloaded per component")
+CACHE_LOOKUPS = REGISTRY.counter("redroid_cache_lookups_total", "Download and layer cache lookups by result")
+RETRIES = REGISTRY.counter("redroid_retries_total", "Repeated downloads by reason")
+PHASE_SECONDS = REGISTRY.histogram("redroid_phase_seconds", "Seconds spent in each install phase of a component")
+STAGED_BYTES = REGISTRY.gauge("redroid_staged_bytes", "Bytes staged into the copy dir of each addon of an image")
+COMMANDS = REGISTRY.counter("redroid_commands_total", "Commands run by result")
+BUILD_SECONDS = REGISTRY.histogram("redroid_build_seconds", "Seconds of container image builds by result")
+RUN_END = REGISTRY.gauge("redroid_run_end_timestamp_seconds", "When the run that wrote this file ended")
+
+def enable():
+    """Also collect metrics that cost extra work, such as walking staged trees"""
+    REGISTRY.enabled = True
+
+def write_metrics(path):
+    REGISTRY.write(path)
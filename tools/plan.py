@@ -0,0 +1,142 @@
+import json
+import os
+import zipfile
+
+from tools.helper import bcolors, get_download_dir, print_color
+from tools.layers import cached_layer
+from tools.workspace import file_lock
+
+# Throughput samples kept per kind, older ones are dropped
+HISTORY_SAMPLES = 20
+
+def history_file():
+    return os.path.join(os.path.dirname(get_download_dir()), "history.json")
+
+def load_history():
+    try:
+        with open(history_file()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_throughput(kind, input_bytes, output_bytes, seconds):
+    """Remember how long a download/extract took so plans can estimate future runs"""
+    path = history_file()
+    with file_lock(path):
+        history = load_history()
+        samples = history.setdefault(kind, [])
+        samples.append({"in": input_bytes, "out": output_bytes, "seconds": seconds})
+        del samples[:-HISTORY_SAMPLES]
+        with open(path, "w") as f:
+            json.dump(history, f)
+
+def rate(history, kind, field="in"):
+    """Average bytes per second of a kind, or None without history"""
+    samples = history.get(kind, [])
+    seconds = sum(s["seconds"] for s in samples)
+    if not samples or seconds <= 0:
+        return None
+    return sum(s[field] for s in samples) / seconds
+
+def expansion_ratio(history):
+    """Average extracted bytes per archive byte, or None without history"""
+    samples = history.get("extract", [])
+    archive_bytes = sum(s["in"] for s in samples)
+    if not archive_bytes:
+        return None
+    return sum(s["out"] for s in samples) / archive_bytes
+
+def remote_size(url):
+    import requests
+
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=10)
+        response.raise_for_status()
+        size = int(response.headers.get("content-length", 0))
+        return size or None
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+def extracted_size(archive):
+    try:
+        with zipfile.ZipFile(archive) as z:
+            return sum(info.file_size for info in z.infolist())
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+def build_plan(builds, layer_cache=False):
+    """Resolve builds [(image name, selected)] against the download and layer caches
+
+    Nothing is downloaded or extracted; sizes of missing artifacts come from a
+    HEAD request, and extraction sizes of missing archives are estimated from
+    the recorded history.
+    """
+    history = load_history()
+    ratio = expansion_ratio(history)
+    artifacts = {}
+    plan = {"builds": [], "artifacts": []}
+
+    for image, selected in builds:
+        layers = []
+        for name, components in selected:
+            cached = layer_cache and cached_layer(components) is not None
+            layers.append({"name": name, "cached": cached})
+            if cached:
+                continue
+            for component in components:
+                for key, url, path in component.cache_entries():
+                    if key in artifacts:
+                        continue
+                    artifact = {"key": key, "url": url, "file": path, "cached": os.path.isfile(path)}
+                    if artifact["cached"]:
+                        artifact["size"] = os.path.getsize(path)
+                        artifact["extract_size"] = extracted_size(path)
+                    else:
+                        artifact["size"] = remote_size(url)
+                        artifact["extract_size"] = None
+                    if artifact["extract_size"] is None and artifact["size"] and ratio:
+                        artifact["extract_size"] = int(artifact["size"] * ratio)
+                    artifacts[key] = artifact
+        plan["builds"].append({"image": image, "layers": layers})
+
+    plan["artifacts"] = list(artifacts.values())
+    fetch = [a for a in plan["artifacts"] if not a["cached"]]
+    plan["bytes_to_fetch"] = sum(a["size"] or 0 for a in fetch)
+    plan["unknown_sizes"] = len([a for a in fetch if a["size"] is None])
+    plan["bytes_cached"] = sum(a["size"] or 0 for a in plan["artifacts"] if a["cached"])
+    plan["extract_bytes"] = sum(a["extract_size"] or 0 for a in plan["artifacts"])
+    plan["layers_to_rebuild"] = sum(1 for b in plan["builds"] for layer in b["layers"] if not layer["cached"])
+
+    download_rate = rate(history, "download")
+    extract_rate = rate(history, "extract", "out")
+    if download_rate and extract_rate:
+        plan["estimated_seconds"] = round(plan["bytes_to_fetch"] / download_rate + plan["extract_bytes"] / extract_rate, 1)
+    else:
+        plan["estimated_seconds"] = None
+    return plan
+
+def print_plan(plan):
+    def size(n):
+        return "unknown" if n is None else "{:.1f} MiB".format(n / 1024 ** 2)
+
+    for build in plan["builds"]:
+        print_color(build["image"], bcolors.GREEN)
+        for layer in build["layers"]:
+            print("    {:<14} {}".format(layer["name"], "cached layer" if layer["cached"] else "rebuild"))
+    print()
+    for artifact in plan["artifacts"]:
+        state = "cached" if artifact["cached"] else "fetch"
+        print("{:<28} {:<7} {:>12}  (extracts to {})".format(artifact["key"], state, size(artifact["size"]), size(artifact["extract_size"])))
+    print()
+    print("Bytes to fetch:     {}{}".format(size(plan["bytes_to_fetch"]),
+          " (+{} of unknown size)".format(plan["unknown_sizes"]) if plan["unknown_sizes"] else ""))
+    print("Bytes cached:       {}".format(size(plan["bytes_cached"])))
+    print("Extraction size:    {}".format(size(plan["extract_bytes"])))
+    print("Layers to rebuild:  {}".format(plan["layers_to_rebuild"]))
+    if plan["estimated_seconds"] is None:
+        print("Estimated time:     unknown (no throughput history yet)")
+    else:
+        print("Estimated time:     {:.0f}s".format(plan["estimated_seconds"]))
+
+def dump_plan(plan):
+    print(json.dumps(plan, indent=2))
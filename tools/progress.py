@@ -0,0 +1,146 @@
+import shutil
+import sys
+import threading
+import time
+
+# Seconds between redraws of the progress display
+REFRESH_INTERVAL = 0.2
+
+# Bytes read per iteration of a download loop
+DOWNLOAD_CHUNK = 1024 * 1024
+
+def _mib(n):
+    return n / 1024 ** 2
+
+class Bar:
+    """Progress of one transfer; update() only adds to a counter, drawing happens elsewhere"""
+
+    def __init__(self, display, name, total):
+        self.display = display
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.start = time.monotonic()
+        self.closed = False
+
+    def update(self, n):
+        self.done += n
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.display.remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def line(self, width, now):
+        rate = self.done / max(now - self.start, 1e-6)
+        stats = "{:7.1f}/{} MiB {:6.1f} MiB/s".format(
+            _mib(self.done), "{:.1f}".format(_mib(self.total)) if self.total else "?", _mib(rate))
+        name = self.name if len(self.name) <= 30 else "..." + self.name[-27:]
+        if not self.total:
+            return "{:<30} {}".format(name, stats)[:width]
+        fraction = min(self.done / self.total, 1)
+        bar_width = max(width - len(stats) - 40, 10)
+        filled = int(bar_width * fraction)
+        return "{:<30} {:3.0f}% |{}{}| {}".format(name, fraction * 100, "#" * filled, "-" * (bar_width - filled), stats)[:width]
+
+class NullBar:
+    """Stands in for Bar when nothing is drawn"""
+
+    def update(self, n):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class Display:
+    """One block of progress lines for every running transfer, redrawn by a thread at a fixed rate
+
+    Transfers running at the same time get a line each plus a total. When the
+    output is not a terminal, as in CI, bar() hands out NullBars and nothing
+    is drawn at all; the same goes when stdout is redirected.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.bars = []
+        self.lines = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.wake = None
+
+    def enabled(self):
+        # Redraws go to stream, usually stderr, but stdout redirected with > file means no one is watching
+        return self.stream.isatty() and sys.stdout.isatty()
+
+    def bar(self, name, total):
+        if not self.enabled():
+            return NullBar()
+        bar = Bar(self, name, total)
+        with self.lock:
+            self.bars.append(bar)
+            if self.thread is None:
+                self.wake = threading.Event()
+                self.thread = threading.Thread(target=self._run, args=(self.wake,), name="progress", daemon=True)
+                self.thread.start()
+        return bar
+
+    def remove(self, bar):
+        with self.lock:
+            # The finished transfer keeps its final line above the running ones
+            up = "\x1b[{}F".format(self.lines) if self.lines else ""
+            self.stream.write(up + "\x1b[2K" + bar.line(self._width(), time.monotonic()) + "\n")
+            self.bars.remove(bar)
+            self._draw(up=0, stale=max(self.lines - 1, 0))
+            if self.bars:
+                return
+            thread, self.thread = self.thread, None
+            self.wake.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self, wake):
+        while not wake.wait(REFRESH_INTERVAL):
+            with self.lock:
+                self._draw()
+
+    @staticmethod
+    def _width():
+        return shutil.get_terminal_size().columns - 1
+
+    def _draw(self, up=None, stale=None):
+        """Redraw the block; up is how far its top is above the cursor, stale how many old lines lie below"""
+        up = self.lines if up is None else up
+        stale = self.lines if stale is None else stale
+        now = time.monotonic()
+        width = self._width()
+        lines = [bar.line(width, now) for bar in self.bars]
+        if len(self.bars) > 1:
+            total = Bar(self, "total ({} downloads)".format(len(self.bars)), sum(bar.total for bar in self.bars))
+            total.done = sum(bar.done for bar in self.bars)
+            total.start = min(bar.start for bar in self.bars)
+            lines.append(total.line(width, now))
+        out = "\x1b[{}F".format(up) if up else ""
+        out += "".join("\x1b[2K" + line + "\n" for line in lines)
+        if stale > len(lines):
+            out += "\x1b[2K\n" * (stale - len(lines)) + "\x1b[{}F".format(stale - len(lines))
+        self.lines = len(lines)
+        self.stream.write(out)
+        self.stream.flush()
+
+DISPLAY = Display()
+
+def progress(name, total):
+    """Bar for a transfer of total bytes (0 when unknown) on the shared display"""
+    return DISPLAY.bar(name, total)
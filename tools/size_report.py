@@ -0,0 +1,95 @@
+import hashlib
+import heapq
+import json
+import os
+import tarfile
+from collections import defaultdict
+
+from tools.trace import span
+
+# Largest files listed per component
+TOP_FILES = 10
+
+def _dir_entries(root):
+    for parent, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(parent, name)
+            if not os.path.islink(path):
+                yield os.path.relpath(path, root), os.path.getsize(path), lambda path=path: open(path, "rb")
+
+def _tar_entries(tar):
+    for member in tar:
+        if member.isreg():
+            yield member.name, member.size, lambda member=member: tar.extractfile(member)
+
+def _digest(opener):
+    h = hashlib.sha256()
+    with opener() as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+@span("size_report")
+def size_report(image, sources, top=TOP_FILES):
+    """Size accounting of the staged addons of an image
+
+    sources are (name, path) pairs where path is a staged copy dir or a layer
+    tarball. Files with the same content in more than one addon are reported
+    as duplicates; only sizes shared across addons get hashed.
+    """
+    components = []
+    by_size = defaultdict(list)
+    tars = []
+    try:
+        for name, path in sources:
+            if os.path.isdir(path):
+                entries = _dir_entries(path)
+            else:
+                tars.append(tarfile.open(path))
+                entries = _tar_entries(tars[-1])
+            total = count = 0
+            largest = []
+            for rel, size, opener in entries:
+                total += size
+                count += 1
+                if len(largest) < top:
+                    heapq.heappush(largest, (size, rel))
+                else:
+                    heapq.heappushpop(largest, (size, rel))
+                by_size[size].append((name, rel, opener))
+            components.append({
+                "name": name,
+                "path": path,
+                "bytes": total,
+                "files": count,
+                "largest": [{"path": rel, "bytes": size} for size, rel in sorted(largest, reverse=True)],
+            })
+
+        duplicates = []
+        for size, files in by_size.items():
+            if size == 0 or len({name for name, _, _ in files}) < 2:
+                continue
+            by_digest = defaultdict(list)
+            for name, rel, opener in files:
+                by_digest[_digest(opener)].append({"component": name, "path": rel})
+            for digest, copies in by_digest.items():
+                if len({copy["component"] for copy in copies}) > 1:
+                    duplicates.append({"sha256": digest, "bytes": size, "copies": copies})
+    finally:
+        for tar in tars:
+            tar.close()
+
+    duplicates.sort(key=lambda d: d["bytes"] * (len(d["copies"]) - 1), reverse=True)
+    return {
+        "image": image,
+        "bytes": sum(c["bytes"] for c in components),
+        "components": components,
+        "duplicated_bytes": sum(d["bytes"] * (len(d["copies"]) - 1) for d in duplicates),
+        "duplicates": duplicates,
+    }
+
+def write_report(report, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
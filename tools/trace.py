@@ -0,0 +1,83 @@
+import functools
+import json
+import os
+import threading
+import time
+
+class Tracer:
+    """Spans of this process kept as Chrome trace events (chrome://tracing, Perfetto)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, category, start, end, args=None):
+        """Record a finished span; start and end are time.time() values"""
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6,
+                 "pid": os.getpid(), "tid": thread.native_id}
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+            self.threads[thread.native_id] = thread.name
+
+    def trace_events(self):
+        with self.lock:
+            names = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                     for tid, name in self.threads.items()]
+            return names + sorted(self.events, key=lambda event: event["ts"])
+
+    def write(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+        os.replace(tmp, path)
+
+TRACER = Tracer()
+
+def enable():
+    TRACER.enabled = True
+
+def write_trace(path):
+    TRACER.write(path)
+
+class span:
+    """Time a block as a trace span, or every call of a function when used as a decorator
+
+        with span("Gapps.copy", "install"):
+            ...
+
+        @span("normalize_tree")
+        def normalize_tree(root):
+            ...
+
+    Costs next to nothing while tracing is not enabled.
+    """
+
+    def __init__(self, name, category="build", **args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        if TRACER.enabled:
+            self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            args = dict(self.args, error=exc_type.__name__) if exc_type else self.args
+            TRACER.add(self.name, self.category, self.start, time.time(), args)
+            self.start = None
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # A fresh span per call, calls may overlap across threads
+            with span(self.name, self.category, **self.args):
+                return func(*args, **kwargs)
+        return wrapper
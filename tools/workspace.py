@@ -0,0 +1,38 @@
+import contextlib
+import fcntl
+import os
+import shutil
+import tempfile
+
+class Workspace:
+    """Per-job directory holding the staged copy dirs, extract dirs and Dockerfile"""
+
+    def __init__(self, root=None):
+        if root is None:
+            root = tempfile.mkdtemp(prefix="redroid-job-", dir=os.environ.get("REDROID_WORK_DIR"))
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    @property
+    def extract_root(self):
+        return self.path("extract")
+
+    @property
+    def dockerfile(self):
+        return self.path("Dockerfile")
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a shared cache entry while it is checked or written"""
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)